@@ -3,17 +3,29 @@ SlayPay AI Agent - Main Loop
 Orchestrates observation, reasoning, decision-making, and learning
 """
 
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify, request
+from typing import Dict, List, Tuple
 import threading
 import time
-from datetime import datetime
+from datetime import datetime, timezone
+
+_module_started = time.monotonic()  # cold-start timings are measured from here
 
 # Import agent modules
-from observe import fetch_recent_events, fetch_metrics, structure_events
-from reason import analyze_all
-from decide import generate_decisions
+from observe import fetch_recent_events, fetch_metrics, structure_events, sample_events, distinct_failed_users, LoadShedder
+from reason import analyze_all, required_aggregates
+from decide import generate_decisions, compile_routing_table
 from memory import AgentMemory
+from outcome import evaluate_outcomes
 from explain import explain_analysis, explain_decision, format_decision_for_dashboard
+from scheduler import CycleScheduler, StageTimeout
+from pipeline import StagePipeline, PIPELINE_QUEUE_SIZE
+from stream import ChangeFeed, parse_since, sse_events
+from routing import EMPTY_TABLE, RoutingTable
+from snapshot import save_snapshot, load_snapshot, SNAPSHOT_EVERY_CYCLES
+from store import EventStore, ChainIndex, DIMENSIONS, QUERY_LIMIT, MAX_QUERY_LIMIT, parse_time_arg, parse_event_time
+from timeseries import TimeSeriesStore, entity_key
+from archive import ArchiveWriter, DECISION_CREATED, DECISION_UPDATED, DECISION_SCORED, DECISION_RETIRED
 
 app = Flask(__name__)
 
@@ -22,11 +34,27 @@ agent_status = {
     'running': False,
     'last_run': None,
     'last_analysis': None,
-    'total_runs': 0
+    'total_runs': 0,
+    'warm_start': {
+        'status': 'pending',
+        'api_ready_ms': None,
+        'state_restored_ms': None,
+        'restore_ms': None,
+        'snapshot_age_seconds': None
+    }
 }
 
 current_decisions = []
-memory = AgentMemory()
+last_structured_data = None
+memory = AgentMemory(autoload=False)  # loaded in the background by warm_start()
+warm_start_ready = threading.Event()
+feed = ChangeFeed()  # versioned change log for ?since= deltas and /agent/stream
+routing_table = EMPTY_TABLE  # swapped (never mutated) once per cycle
+event_store = EventStore()  # bounded window of raw events for /agent/query drill-downs
+chains = ChainIndex()  # retry chains by transaction_id, so aggregates count final outcomes
+timeseries = TimeSeriesStore()  # per-minute history on disk, opened by warm_start()
+archive = ArchiveWriter()  # day-partitioned Parquet files, written off the hot loop
+shedder = LoadShedder()  # samples events per bank+method once aggregation exceeds its budget
 
 # Workflow state tracking for explainability
 workflow_state = {
@@ -64,137 +92,422 @@ workflow_state = {
 
 # Agent configuration
 AGENT_LOOP_INTERVAL = 30  # seconds
+# Aggregates read outside the detectors (observe summary, routing table)
+AGENT_AGGREGATES = {'by_status', 'by_bank', 'by_method', 'by_pair'}
+TREND_MINUTES = 180  # default /agent/history trend span
+MAX_TREND_POINTS = 1440
+
+scheduler = CycleScheduler(base_interval=AGENT_LOOP_INTERVAL)
+workflow_state['scheduler'] = scheduler.report()
+
+def publish_stage(stage: str):
+    """Publish a workflow stage transition to the change feed"""
+    feed.publish('stage', stage, dict(workflow_state[stage]))
+
+def publish_decisions(decisions: List[Dict]):
+    """Publish new/updated decisions and retire ones no longer current"""
+    current_ids = set()
+    for decision in decisions:
+        current_ids.add(decision.get('decision_id'))
+        feed.publish('decision', decision.get('decision_id'), dict(decision))
+    for decision_id in feed.keys('decision'):
+        if decision_id not in current_ids:
+            feed.publish('decision', decision_id, None)
+
+def observe_stage() -> Dict:
+    """Step 1: Observe - Fetch data from backend"""
+    global last_structured_data
+    
+    workflow_state['observe']['status'] = 'running'
+    workflow_state['observe']['last_updated'] = datetime.now().isoformat()
+    publish_stage('observe')
+    print("📊 Observing payment events...")
+    
+    events = fetch_recent_events(limit=100)
+    new_events = event_store.ingest(events)
+    # The time series keeps final attempts only, like the aggregates below
+    superseded = chains.ingest(new_events)
+    timeseries.ingest(chains.final_attempts(new_events))
+    timeseries.retract(superseded)
+    final_events = chains.final_attempts(events)
+    
+    # Aggregate a stratified sample instead of every event while over budget
+    target = shedder.sample_target(len(final_events))
+    started = time.perf_counter()
+    if target is None:
+        aggregated, weights, strata, user_caps = final_events, None, None, None
+    else:
+        aggregated, weights, strata = sample_events(final_events, target)
+        user_caps = distinct_failed_users(final_events)
+    sampled = time.perf_counter()
+    structured_data = structure_events(aggregated, required_aggregates() | AGENT_AGGREGATES, weights, user_caps)
+    aggregate_ms = (time.perf_counter() - sampled) * 1000
+    shedder.record(len(final_events), len(aggregated), aggregate_ms)
+    structured_data['sampling'] = {
+        'enabled': weights is not None,
+        'observed': len(final_events),
+        'aggregated': len(aggregated),
+        'strata': strata,
+        'sample_ms': round((sampled - started) * 1000, 2),
+        'aggregate_ms': round(aggregate_ms, 2)
+    }
+    timestamps = [t for t in (parse_event_time(e.get('timestamp')) for e in events) if t]
+    structured_data['window'] = {
+        'observed_at': datetime.now(timezone.utc).isoformat(),
+        'start': min(timestamps, default=None),
+        'end': max(timestamps, default=None)
+    }
+    structured_data['new_events'] = len(new_events)
+    archive.add_events(new_events, structured_data['window'])
+    last_structured_data = structured_data
+    
+    workflow_state['observe']['status'] = 'completed'
+    workflow_state['observe']['summary'] = f"Analyzed {structured_data['total']} recent events across {len(structured_data.get('by_bank', {}))} banks and {len(structured_data.get('by_method', {}))} payment methods"
+    if weights is not None:
+        workflow_state['observe']['summary'] += f" (load shedding: aggregated a stratified sample of {len(aggregated)})"
+    workflow_state['observe']['details'] = {
+        'total_events': structured_data['total'],
+        'banks': len(structured_data.get('by_bank', {})),
+        'methods': len(structured_data.get('by_method', {})),
+        'statuses': structured_data.get('by_status', {}),
+        'new_events': len(new_events),
+        'stored_events': event_store.size,
+        'superseded_attempts': len(events) - len(final_events),
+        'retry_chains': chains.stats(),
+        'sampling': {**structured_data['sampling'], **shedder.report()}
+    }
+    publish_stage('observe')
+    print(f"   Analyzed {structured_data['total']} transactions")
+    return structured_data
+
+def reason_stage(structured_data: Dict) -> Dict:
+    """Step 2: Reason - Detect anomalies"""
+    workflow_state['reason']['status'] = 'running'
+    workflow_state['reason']['last_updated'] = datetime.now().isoformat()
+    publish_stage('reason')
+    print("🧠 Analyzing patterns...")
+    
+    analysis = analyze_all(structured_data)
+    agent_status['last_analysis'] = analysis
+    
+    workflow_state['reason']['status'] = 'completed'
+    anomaly_summary = []
+    if analysis.get('bank_anomalies'):
+        anomaly_summary.append(f"{len(analysis['bank_anomalies'])} bank issues")
+    if analysis.get('method_anomalies'):
+        anomaly_summary.append(f"{len(analysis['method_anomalies'])} payment method issues")
+    if analysis.get('error_patterns'):
+        anomaly_summary.append(f"{len(analysis['error_patterns'])} error patterns")
+    
+    workflow_state['reason']['summary'] = f"Detected {analysis['total_anomalies']} anomalies: {', '.join(anomaly_summary) if anomaly_summary else 'none'}"
+    workflow_state['reason']['details'] = {
+        'total_anomalies': analysis['total_anomalies'],
+        'bank_anomalies': len(analysis.get('bank_anomalies', [])),
+        'method_anomalies': len(analysis.get('method_anomalies', [])),
+        'error_patterns': len(analysis.get('error_patterns', [])),
+        'detector_timings_ms': analysis['detector_timings_ms']
+    }
+    publish_stage('reason')
+    print(f"   Found {analysis['total_anomalies']} anomalies")
+    
+    # Print analysis summary
+    print("\n" + explain_analysis(analysis, structured_data))
+    return analysis
+
+def decide_stage(analysis: Dict, structured_data: Dict) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Step 3: Decide - Generate actions with persistence tracking and compile routing weights
+    
+    Decisions are recorded in memory here (in-memory only) rather than in the
+    memory stage, so the next cycle's decide always coalesces against them even
+    while this cycle is still being persisted.
+    
+    Returns:
+        (decisions, the ones that are new rather than coalesced updates,
+         previously current decisions that were not renewed)
+    """
+    global current_decisions, routing_table
+    
+    workflow_state['decide']['status'] = 'running'
+    workflow_state['decide']['last_updated'] = datetime.now().isoformat()
+    publish_stage('decide')
+    print("\n💡 Generating decisions...")
+    
+    with memory.lock:
+        decisions = generate_decisions(analysis, memory)
+        new_decisions = [d for d in decisions if d.get('decision_id') not in memory.decision_index]
+        for decision in decisions:
+            memory.record_decision(decision)
+        # Resolve issues that stopped recurring, cleanup old resolved issues
+        memory.resolve_idle_issues()
+        memory.cleanup_old_issues(max_age_hours=24)
+    decision_ids = {d.get('decision_id') for d in decisions}
+    retired = [d for d in current_decisions if d.get('decision_id') not in decision_ids]
+    current_decisions = decisions
+    publish_decisions(decisions)
+    
+    routing_table = compile_routing_table(analysis, structured_data, routing_table)
+    feed.publish('routing', 'table', {'version': routing_table.version, 'generated_at': routing_table.generated_at})
+    
+    workflow_state['decide']['status'] = 'completed'
+    high_priority = sum(1 for d in decisions if d.get('severity') == 'HIGH')
+    medium_priority = sum(1 for d in decisions if d.get('severity') == 'MEDIUM')
+    workflow_state['decide']['summary'] = f"Generated {len(decisions)} recommended actions ({high_priority} high priority, {medium_priority} medium priority)"
+    workflow_state['decide']['details'] = {
+        'total_decisions': len(decisions),
+        'high_priority': high_priority,
+        'medium_priority': medium_priority,
+        'low_priority': len(decisions) - high_priority - medium_priority,
+        'routing_version': routing_table.version
+    }
+    publish_stage('decide')
+    print(f"   Proposed {len(decisions)} actions")
+    return decisions, new_decisions, retired
+
+def memory_stage(decisions: List[Dict], new_decisions: List[Dict]) -> List[Dict]:
+    """
+    Steps 4-5: Explain and Remember - Explain new decisions and persist memory
+    
+    Returns:
+        Copies of the decisions scored this cycle
+    """
+    workflow_state['explain']['status'] = 'running'
+    workflow_state['explain']['last_updated'] = datetime.now().isoformat()
+    
+    workflow_state['memory']['status'] = 'running'
+    workflow_state['memory']['last_updated'] = datetime.now().isoformat()
+    publish_stage('explain')
+    publish_stage('memory')
+    
+    for decision in new_decisions:
+        print(f"\n{explain_decision(decision)}")
+    
+    workflow_state['explain']['status'] = 'completed'
+    workflow_state['explain']['summary'] = f"Generated human-readable explanations for {len(decisions)} decisions with evidence and reasoning"
+    workflow_state['explain']['details'] = {
+        'decisions_explained': len(decisions),
+        'new_decisions': len(new_decisions)
+    }
+    publish_stage('explain')
+    
+    # Score decisions whose after-window has elapsed, saved with this cycle's flush
+    outcomes = evaluate_outcomes(memory.pending_decisions(), timeseries)
+    scored_decisions = []
+    if outcomes:
+        with memory.lock:
+            memory.update_outcomes(outcomes)
+            # Copies, so later coalescing can't change the scored version
+            scored_decisions = [dict(memory.decision_index[o['decision_id']]) for o in outcomes
+                                if o['decision_id'] in memory.decision_index]
+        # Republish scored decisions still in the feed; retiring is left to
+        # decide, which may already be on a later cycle
+        for decision in scored_decisions:
+            feed.update('decision', decision['decision_id'], dict(decision))
+        scored = ", ".join(f"{o['decision_id']} {o['outcome']} ({o['reward']:+.2f})" for o in outcomes)
+        print(f"📈 Scored {len(outcomes)} decision outcomes: {scored}")
+    
+    memory.flush()
+    timeseries.flush()
+    
+    workflow_state['memory']['status'] = 'completed'
+    mem_stats = memory.get_stats()
+    workflow_state['memory']['summary'] = f"Stored {len(new_decisions)} new decisions, updated {len(decisions) - len(new_decisions)} live decisions, scored {len(outcomes)} outcomes. Tracking {mem_stats.get('active_issues', 0)} active issues across {mem_stats.get('total_decisions', 0)} total decisions"
+    workflow_state['memory']['details'] = {
+        'total_decisions': mem_stats.get('total_decisions', 0),
+        'active_issues': mem_stats.get('active_issues', 0),
+        'success_rate': mem_stats.get('success_rate', 0),
+        'outcomes_scored': len(outcomes),
+        'pending_outcomes': mem_stats.get('recent_decisions', 0),
+        'archive': archive.report()
+    }
+    
+    # Periodic snapshot for warm restarts
+    if (agent_status['total_runs'] + 1) % SNAPSHOT_EVERY_CYCLES == 0:
+        workflow_state['memory']['details']['snapshot_bytes'] = save_runtime_snapshot()
+    publish_stage('memory')
+    return scored_decisions
+
+def save_runtime_snapshot() -> int:
+    """Snapshot aggregates, the event window, active issues and the ingestion cursor"""
+    try:
+        size = save_snapshot({
+            'event_store': event_store.to_snapshot(),
+            'chains': chains.to_snapshot(),
+            'last_structured_data': last_structured_data,
+            'last_analysis': agent_status['last_analysis'],
+            'current_decisions': current_decisions,
+            'routing_table': routing_table.to_dict(),
+            'active_issues': memory.active_issues(),
+            'feed_version': feed.version,
+            'total_runs': agent_status['total_runs']
+        })
+        print(f"💾 Saved runtime snapshot ({size / 1024:.0f} KB)")
+        return size
+    except Exception as e:
+        print(f"Error saving snapshot: {e}")
+        return 0
+
+def warm_start():
+    """Load memory and the latest runtime snapshot in the background"""
+    global current_decisions, last_structured_data, routing_table
+    
+    warm = agent_status['warm_start']
+    warm['status'] = 'restoring'
+    started = time.monotonic()
+    try:
+        memory.load()
+        timeseries.open()
+        snapshot = load_snapshot()
+        if snapshot:
+            event_store.restore(snapshot['event_store'])
+            if 'chains' in snapshot:
+                chains.restore(snapshot['chains'])
+            routing_table = RoutingTable.from_dict(snapshot['routing_table'])
+            last_structured_data = snapshot['last_structured_data']
+            agent_status['last_analysis'] = snapshot['last_analysis']
+            agent_status['total_runs'] = max(agent_status['total_runs'], snapshot['total_runs'])
+            memory.restore_active_issues(snapshot['active_issues'])
+            # Point restored decisions at the memory's copies so coalescing keeps updating them
+            current_decisions = [memory.decision_index.get(d.get('decision_id'), d) for d in snapshot['current_decisions']]
+            feed.restore(snapshot['feed_version'])
+            publish_decisions(current_decisions)
+            warm['snapshot_age_seconds'] = round(time.time() - snapshot['saved_at'], 1)
+        warm['status'] = 'restored' if snapshot else 'cold'
+    except Exception as e:
+        print(f"Error during warm start: {e}")
+        warm['status'] = 'failed'
+    warm['restore_ms'] = round((time.monotonic() - started) * 1000, 1)
+    warm['state_restored_ms'] = round((time.monotonic() - _module_started) * 1000, 1)
+    print(f"♻️  Warm start {warm['status']} in {warm['restore_ms']:.0f}ms "
+          f"({event_store.size} events, {len(current_decisions)} live decisions)")
+    warm_start_ready.set()
+
+# Stages a pipeline stage's errors are reported against
+PIPELINE_STAGE_STEPS = {
+    'observe': ('observe',),
+    'analyze': ('reason', 'decide'),
+    'persist': ('explain', 'memory')
+}
+
+def publish_scheduler():
+    """Refresh the scheduler entry, including pipeline queue depths"""
+    state = scheduler.report()
+    queues = pipeline.report()
+    state['details']['queues'] = queues
+    state['summary'] += ", queued " + ", ".join(f"{stage} {q['depth']}/{q['capacity']}" for stage, q in queues.items())
+    workflow_state['scheduler'] = state
+    publish_stage('scheduler')
+
+def handle_cycle_error(stage: str, cycle: Dict, error: Exception):
+    """Back off and mark the failed stage as warning (the cycle is dropped)"""
+    backoff = scheduler.record_error(cycle.get('started'))
+    print(f"❌ Error in agent cycle #{cycle.get('number')} ({stage}): {error} (retrying in {backoff:g}s)")
+    steps = (error.stage,) if isinstance(error, StageTimeout) else PIPELINE_STAGE_STEPS.get(stage, ())
+    for step in steps:
+        if workflow_state[step]['status'] == 'running':
+            workflow_state[step]['status'] = 'warning'
+            workflow_state[step]['summary'] = f"Error: {str(error)}"
+            publish_stage(step)
+    publish_scheduler()
+
+def analyze_cycle(cycle: Dict) -> Dict:
+    """Pipeline stage: reason and decide for one observed cycle"""
+    cycle['analysis'] = scheduler.run_stage('reason', reason_stage, cycle['structured_data'])
+    cycle['decisions'], cycle['new_decisions'], retired = scheduler.run_stage(
+        'decide', decide_stage, cycle['analysis'], cycle['structured_data'])
+    
+    # Copy this cycle's decision versions for the archive now: the next
+    # cycle's decide can coalesce into the same live decisions before persist
+    new_ids = {d.get('decision_id') for d in cycle['new_decisions']}
+    with memory.lock:
+        cycle['decision_versions'] = [
+            (DECISION_CREATED, [dict(d) for d in cycle['new_decisions']]),
+            (DECISION_UPDATED, [dict(d) for d in cycle['decisions'] if d.get('decision_id') not in new_ids]),
+            (DECISION_RETIRED, [dict(d) for d in retired])
+        ]
+    return cycle
+
+def persist_cycle(cycle: Dict):
+    """Pipeline stage: explain and persist one cycle, then close it out"""
+    scored = scheduler.run_stage('memory', memory_stage, cycle['decisions'], cycle['new_decisions'])
+    
+    # Archive every decision version: created, coalesced, scored and retired
+    window = cycle['structured_data']['window']
+    for change, versions in cycle['decision_versions'] + [(DECISION_SCORED, scored)]:
+        archive.add_decisions(versions, window, change)
+    
+    # Update status
+    agent_status['last_run'] = datetime.now().isoformat()
+    agent_status['total_runs'] += 1
+    
+    scheduler.complete_cycle(cycle['started'])
+    scheduler.adapt(
+        high_severity_active=any(d.get('severity') == 'HIGH' for d in cycle['decisions']),
+        event_count=cycle['structured_data']['new_events'],
+        anomaly_count=cycle['analysis']['total_anomalies']
+    )
+    print(f"\n✓ Cycle #{cycle['number']} complete in {scheduler.stats['last_cycle_ms']:.0f}ms. Next cycle in ~{scheduler.interval:g}s...\n")
+    publish_scheduler()
+
+# Observe runs on the tick loop; analysis and persistence run on pipeline
+# workers, so the fetch for cycle N+1 overlaps the analysis and save of cycle N
+pipeline = StagePipeline([
+    ('analyze', analyze_cycle),
+    ('persist', persist_cycle)
+], queue_size=PIPELINE_QUEUE_SIZE, on_error=handle_cycle_error)
 
 def agent_loop():
-    """Main agent loop - runs periodically"""
-    global agent_status, current_decisions, workflow_state
+    """
+    Main agent loop - observes once per scheduler tick and feeds the pipeline.
+    
+    Submitting blocks while the analyze queue is full, so a slow analysis or
+    persist backs up into observe; ticks missed meanwhile are shed by the
+    scheduler rather than queued.
+    """
+    global agent_status, workflow_state
     
     print("🤖 Agent loop starting...")
     agent_status['running'] = True
     
-    while agent_status['running']:
+    # Restore state off the API's critical path; the first cycle waits for it
+    if agent_status['warm_start']['status'] == 'pending':
+        threading.Thread(target=warm_start, daemon=True, name='agent-warm-start').start()
+    warm_start_ready.wait()
+    archive.start()
+    pipeline.start()
+    
+    cycle_number = agent_status['total_runs']
+    while agent_status['running'] and scheduler.wait_for_next_tick():
+        # Reset completed stages to idle for the new cycle
+        for stage in workflow_state:
+            if workflow_state[stage]['status'] == 'completed':
+                workflow_state[stage]['status'] = 'idle'
+                publish_stage(stage)
+        
+        hung_stage = scheduler.should_shed()
+        if hung_stage:
+            scheduler.shed_tick()
+            print(f"⏭️  Skipping cycle - {hung_stage} stage from an earlier cycle is still running")
+            publish_scheduler()
+            continue
+        
+        cycle_number += 1
+        cycle = {'number': cycle_number, 'started': scheduler.cycle_started}
+        print(f"\n{'='*60}")
+        print(f"Agent Cycle #{cycle_number} - {datetime.now().isoformat()}")
+        print(f"{'='*60}\n")
+        
         try:
-            print(f"\n{'='*60}")
-            print(f"Agent Cycle #{agent_status['total_runs'] + 1} - {datetime.now().isoformat()}")
-            print(f"{'='*60}\n")
-            
-            # Step 1: Observe - Fetch data from backend
-            workflow_state['observe']['status'] = 'running'
-            workflow_state['observe']['last_updated'] = datetime.now().isoformat()
-            print("📊 Observing payment events...")
-            
-            events = fetch_recent_events(limit=100)
-            structured_data = structure_events(events)
-            
-            workflow_state['observe']['status'] = 'completed'
-            workflow_state['observe']['summary'] = f"Analyzed {structured_data['total']} recent events across {len(structured_data.get('by_bank', {}))} banks and {len(structured_data.get('by_method', {}))} payment methods"
-            workflow_state['observe']['details'] = {
-                'total_events': structured_data['total'],
-                'banks': len(structured_data.get('by_bank', {})),
-                'methods': len(structured_data.get('by_method', {})),
-                'statuses': structured_data.get('by_status', {})
-            }
-            print(f"   Analyzed {structured_data['total']} transactions")
-            
-            # Step 2: Reason - Detect anomalies
-            workflow_state['reason']['status'] = 'running'
-            workflow_state['reason']['last_updated'] = datetime.now().isoformat()
-            print("🧠 Analyzing patterns...")
-            
-            analysis = analyze_all(structured_data)
-            agent_status['last_analysis'] = analysis
-            
-            workflow_state['reason']['status'] = 'completed'
-            anomaly_summary = []
-            if analysis.get('bank_anomalies'):
-                anomaly_summary.append(f"{len(analysis['bank_anomalies'])} bank issues")
-            if analysis.get('method_anomalies'):
-                anomaly_summary.append(f"{len(analysis['method_anomalies'])} payment method issues")
-            if analysis.get('error_patterns'):
-                anomaly_summary.append(f"{len(analysis['error_patterns'])} error patterns")
-            
-            workflow_state['reason']['summary'] = f"Detected {analysis['total_anomalies']} anomalies: {', '.join(anomaly_summary) if anomaly_summary else 'none'}"
-            workflow_state['reason']['details'] = {
-                'total_anomalies': analysis['total_anomalies'],
-                'bank_anomalies': len(analysis.get('bank_anomalies', [])),
-                'method_anomalies': len(analysis.get('method_anomalies', [])),
-                'error_patterns': len(analysis.get('error_patterns', []))
-            }
-            print(f"   Found {analysis['total_anomalies']} anomalies")
-            
-            # Print analysis summary
-            print("\n" + explain_analysis(analysis, structured_data))
-            
-            # Step 3: Decide - Generate actions with persistence tracking
-            workflow_state['decide']['status'] = 'running'
-            workflow_state['decide']['last_updated'] = datetime.now().isoformat()
-            print("\n💡 Generating decisions...")
-            
-            decisions = generate_decisions(analysis, memory)
-            current_decisions = decisions
-            
-            workflow_state['decide']['status'] = 'completed'
-            high_priority = sum(1 for d in decisions if d.get('severity') == 'HIGH')
-            medium_priority = sum(1 for d in decisions if d.get('severity') == 'MEDIUM')
-            workflow_state['decide']['summary'] = f"Generated {len(decisions)} recommended actions ({high_priority} high priority, {medium_priority} medium priority)"
-            workflow_state['decide']['details'] = {
-                'total_decisions': len(decisions),
-                'high_priority': high_priority,
-                'medium_priority': medium_priority,
-                'low_priority': len(decisions) - high_priority - medium_priority
-            }
-            print(f"   Proposed {len(decisions)} actions")
-            
-            # Step 4: Explain - Format decisions
-            workflow_state['explain']['status'] = 'running'
-            workflow_state['explain']['last_updated'] = datetime.now().isoformat()
-            
-            # Step 5: Remember - Store decisions
-            workflow_state['memory']['status'] = 'running'
-            workflow_state['memory']['last_updated'] = datetime.now().isoformat()
-            
-            for decision in decisions:
-                memory.record_decision(decision)
-                print(f"\n{explain_decision(decision)}")
-            
-            workflow_state['explain']['status'] = 'completed'
-            workflow_state['explain']['summary'] = f"Generated human-readable explanations for {len(decisions)} decisions with evidence and reasoning"
-            workflow_state['explain']['details'] = {
-                'decisions_explained': len(decisions)
-            }
-            
-            # Cleanup old resolved issues
-            memory.cleanup_old_issues(max_age_hours=24)
-            
-            workflow_state['memory']['status'] = 'completed'
-            mem_stats = memory.get_stats()
-            workflow_state['memory']['summary'] = f"Stored {len(decisions)} decisions. Tracking {mem_stats.get('active_issues', 0)} active issues across {mem_stats.get('total_decisions', 0)} total decisions"
-            workflow_state['memory']['details'] = {
-                'total_decisions': mem_stats.get('total_decisions', 0),
-                'active_issues': mem_stats.get('active_issues', 0),
-                'success_rate': mem_stats.get('success_rate', 0)
-            }
-            
-            # Update status
-            agent_status['last_run'] = datetime.now().isoformat()
-            agent_status['total_runs'] += 1
-            
-            print(f"\n✓ Cycle complete. Sleeping for {AGENT_LOOP_INTERVAL}s...\n")
-            
-            # Reset workflow states to idle for next cycle
-            time.sleep(AGENT_LOOP_INTERVAL)
-            
-            for stage in workflow_state:
-                if workflow_state[stage]['status'] == 'completed':
-                    workflow_state[stage]['status'] = 'idle'
-            
+            cycle['structured_data'] = scheduler.run_stage('observe', observe_stage)
         except Exception as e:
-            print(f"❌ Error in agent loop: {e}")
-            # Mark current stage as warning
-            for stage in workflow_state:
-                if workflow_state[stage]['status'] == 'running':
-                    workflow_state[stage]['status'] = 'warning'
-                    workflow_state[stage]['summary'] = f"Error: {str(e)}"
+            handle_cycle_error('observe', cycle, e)
+            continue
+        
+        pipeline.submit(cycle)
+        publish_scheduler()
+    
+    pipeline.stop()
+    archive.stop()
 
 # ============================================================================
 # API ROUTES (for ops dashboard to query agent)
@@ -210,104 +523,182 @@ def get_status():
             'last_run': agent_status['last_run'],
             'total_runs': agent_status['total_runs'],
             'memory_stats': memory.get_stats(),
-            'last_analysis': agent_status['last_analysis']
+            'last_analysis': agent_status['last_analysis'],
+            'warm_start': agent_status['warm_start']
         }
     })
 
+def build_insight(decision: Dict) -> Dict:
+    """Convert a decision into a structured insight"""
+    # Build evidence object from decision data
+    evidence = {}
+    if decision.get('entity_type') == 'bank' or decision.get('entity_type') == 'method':
+        # Extract failure rate from reasoning
+        reasoning = decision.get('reasoning', '')
+        if 'showing ' in reasoning and '%' in reasoning:
+            try:
+                parts = reasoning.split('showing ')[1].split('%')[0]
+                failure_rate = parts.strip()
+                evidence['failure_rate'] = f"{failure_rate}%"
+            except:
+                evidence['failure_rate'] = "N/A"
+        
+        # Extract baseline from reasoning
+        if 'baseline:' in reasoning:
+            try:
+                baseline = reasoning.split('baseline: ')[1].split('%')[0]
+                evidence['baseline'] = f"{baseline}%"
+            except:
+                evidence['baseline'] = "5%"
+        
+        # Add sample size and failures count
+        if 'transactions' in reasoning:
+            try:
+                sample = reasoning.split('Based on ')[1].split(' transactions')[0]
+                evidence['sample_size'] = sample
+            except:
+                pass
+        
+        evidence['window'] = "last 100-300 transactions"
+        
+        # Sampling interval (load shedding) and payment impact from the decision's evidence
+        decision_evidence = decision.get('evidence') or {}
+        if 'failure_rate_ci' in decision_evidence:
+            low, high = decision_evidence['failure_rate_ci']
+            evidence['failure_rate_ci'] = f"{low}% - {high}%"
+            evidence['sampled'] = decision_evidence['sampled']
+        if decision_evidence.get('value_at_risk'):
+            evidence['value_at_risk'] = f"₹{decision_evidence['value_at_risk']:,.0f}"
+            evidence['affected_users'] = decision_evidence.get('affected_users', 0)
+    
+    # Map confidence to float
+    confidence = decision.get('confidence', 70) / 100.0
+    
+    # Get persistence info
+    persistence = decision.get('persistence', {})
+    persistence_status = persistence.get('status', 'NEW') if persistence else 'NEW'
+    first_detected = persistence.get('first_detected') if persistence else decision.get('timestamp')
+    
+    # Build structured insight
+    insight = {
+        'issue_type': 'FAILURE_SPIKE' if 'failure' in decision.get('issue', '').lower() else 'ANOMALY_DETECTED',
+        'scope': decision.get('entity', 'unknown'),
+        'confidence': round(confidence, 2),
+        'severity': decision.get('severity', 'MEDIUM').upper(),
+        'evidence': evidence,
+        'recommended_action': decision.get('action'),
+        'risk_level': decision.get('risk', 'medium'),
+        'auto_executed': False,
+        'explanation': decision.get('reasoning'),
+        'timestamp': decision.get('timestamp'),
+        'decision_id': decision.get('decision_id'),
+        'persistence_status': persistence_status,
+        'first_detected': first_detected
+    }
+    
+    return insight
+
 @app.route('/agent/insights', methods=['GET'])
 def get_insights():
     """Get agent insights with structured format including severity and persistence"""
-    insights = []
+    since = parse_since(request.args.get('since'))
+    if since is not None:
+        version, changes = feed.since(since, kind='decision')
+        if changes is not None:
+            insights = [build_insight(payload) for _, _, _, payload in changes if payload is not None]
+            return jsonify({
+                'success': True,
+                'version': version,
+                'full': False,
+                'count': len(insights),
+                'insights': insights,
+                'removed': [key for _, _, key, payload in changes if payload is None]
+            })
     
     # Convert current decisions into structured insights
-    for decision in current_decisions:
-        # Build evidence object from decision data
-        evidence = {}
-        if decision.get('entity_type') == 'bank' or decision.get('entity_type') == 'method':
-            # Extract failure rate from reasoning
-            reasoning = decision.get('reasoning', '')
-            if 'showing ' in reasoning and '%' in reasoning:
-                try:
-                    parts = reasoning.split('showing ')[1].split('%')[0]
-                    failure_rate = parts.strip()
-                    evidence['failure_rate'] = f"{failure_rate}%"
-                except:
-                    evidence['failure_rate'] = "N/A"
-            
-            # Extract baseline from reasoning
-            if 'baseline:' in reasoning:
-                try:
-                    baseline = reasoning.split('baseline: ')[1].split('%')[0]
-                    evidence['baseline'] = f"{baseline}%"
-                except:
-                    evidence['baseline'] = "5%"
-            
-            # Add sample size and failures count
-            if 'transactions' in reasoning:
-                try:
-                    sample = reasoning.split('Based on ')[1].split(' transactions')[0]
-                    evidence['sample_size'] = sample
-                except:
-                    pass
-            
-            evidence['window'] = "last 100-300 transactions"
-        
-        # Map confidence to float
-        confidence = decision.get('confidence', 70) / 100.0
-        
-        # Get persistence info
-        persistence = decision.get('persistence', {})
-        persistence_status = persistence.get('status', 'NEW') if persistence else 'NEW'
-        first_detected = persistence.get('first_detected') if persistence else decision.get('timestamp')
-        
-        # Build structured insight
-        insight = {
-            'issue_type': 'FAILURE_SPIKE' if 'failure' in decision.get('issue', '').lower() else 'ANOMALY_DETECTED',
-            'scope': decision.get('entity', 'unknown'),
-            'confidence': round(confidence, 2),
-            'severity': decision.get('severity', 'MEDIUM').upper(),
-            'evidence': evidence,
-            'recommended_action': decision.get('action'),
-            'risk_level': decision.get('risk', 'medium'),
-            'auto_executed': False,
-            'explanation': decision.get('reasoning'),
-            'timestamp': decision.get('timestamp'),
-            'decision_id': decision.get('decision_id'),
-            'persistence_status': persistence_status,
-            'first_detected': first_detected
-        }
-        
-        insights.append(insight)
+    version = feed.version
+    insights = [build_insight(decision) for decision in current_decisions]
     
     return jsonify({
         'success': True,
+        'version': version,
+        'full': True,
         'count': len(insights),
         'insights': insights
     })
 
+def decision_memory_summary() -> Dict:
+    """Memory totals sent with both full and delta /agent/decisions responses"""
+    with memory.lock:
+        return {
+            'total_decisions': len(memory.decisions),
+            'success_rate': memory.get_success_rate()
+        }
+
 @app.route('/agent/decisions', methods=['GET'])
 def get_decisions():
     """Get recent decisions"""
+    since = parse_since(request.args.get('since'))
+    if since is not None:
+        version, changes = feed.since(since, kind='decision')
+        if changes is not None:
+            formatted_decisions = [format_decision_for_dashboard(p) for _, _, _, p in changes if p is not None]
+            return jsonify({
+                'success': True,
+                'version': version,
+                'full': False,
+                'count': len(formatted_decisions),
+                'decisions': formatted_decisions,
+                'removed': [key for _, _, key, payload in changes if payload is None],
+                'memory': decision_memory_summary()
+            })
+    
+    version = feed.version
     formatted_decisions = [format_decision_for_dashboard(d) for d in current_decisions]
     
     return jsonify({
         'success': True,
+        'version': version,
+        'full': True,
         'count': len(formatted_decisions),
         'decisions': formatted_decisions,
-        'memory': {
-            'total_decisions': len(memory.decisions),
-            'success_rate': memory.get_success_rate()
-        }
+        'memory': decision_memory_summary()
     })
 
 @app.route('/agent/history', methods=['GET'])
 def get_history():
-    """Get decision history"""
-    return jsonify({
+    """
+    Get decision history, plus a per-minute trend for one entity when asked
+    (?type=bank|method|pair&entity=HDFC&minutes=180&step=5)
+    """
+    response = {
         'success': True,
         'decisions': memory.get_decisions(limit=20),
         'stats': memory.get_stats()
-    })
+    }
+    
+    entity = request.args.get('entity')
+    if entity:
+        entity_type = request.args.get('type', 'bank')
+        if entity_type not in ('bank', 'method', 'pair'):
+            return jsonify({'success': False, 'error': f"Invalid type: {entity_type}"}), 400
+        try:
+            minutes = min(int(request.args.get('minutes', TREND_MINUTES)), timeseries.retention)
+            step = max(1, int(request.args.get('step', 1)))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'minutes and step must be integers'}), 400
+        step = max(step, -(-minutes // MAX_TREND_POINTS))  # keep the chart to MAX_TREND_POINTS
+        
+        key = entity_key(entity_type, entity)
+        response['trend'] = {
+            'entity': entity,
+            'entity_type': entity_type,
+            'step_minutes': step,
+            'points': timeseries.trend(key, minutes=minutes, step=step),
+            'baseline': timeseries.baseline(key),
+            'seasonal_baseline': timeseries.seasonal_baseline(key)
+        }
+    return jsonify(response)
 
 @app.route('/health', methods=['GET'])
 def health():
@@ -320,8 +711,70 @@ def health():
 @app.route('/agent/workflow_state', methods=['GET'])
 def get_workflow_state():
     """Get current workflow state for explainability view"""
+    since = parse_since(request.args.get('since'))
+    if since is not None:
+        version, changes = feed.since(since, kind='stage')
+        if changes is not None:
+            return jsonify({
+                'success': True,
+                'version': version,
+                'full': False,
+                'workflow': {key: payload for _, _, key, payload in changes},
+                'timestamp': datetime.now().isoformat()
+            })
+    
     return jsonify({
         'success': True,
+        'version': feed.version,
+        'full': True,
         'workflow': workflow_state,
         'timestamp': datetime.now().isoformat()
     })
+
+@app.route('/agent/routing', methods=['GET'])
+def get_routing_table():
+    """Get the full routing weight table for the current version"""
+    table = routing_table
+    etag = f'"{table.version}"'
+    if request.headers.get('If-None-Match') == etag:
+        return Response(status=304, headers={'ETag': etag})
+    return Response(table.to_json(), mimetype='application/json', headers={'ETag': etag})
+
+@app.route('/agent/routing/lookup', methods=['GET'])
+def lookup_route():
+    """Get the effective weight and circuit state for one bank/method (per-transaction hot path)"""
+    table = routing_table
+    response = jsonify(table.lookup(request.args.get('bank'), request.args.get('method')))
+    response.headers['ETag'] = f'"{table.version}"'
+    return response
+
+@app.route('/agent/query', methods=['GET'])
+def query_events():
+    """Drill down into recently observed events by bank/method/status/error_code and time range"""
+    try:
+        since = parse_time_arg(request.args.get('since'))
+        until = parse_time_arg(request.args.get('until'))
+        limit = max(1, min(int(request.args.get('limit', QUERY_LIMIT)), MAX_QUERY_LIMIT))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    filters = {dim: request.args.get(dim) for dim in DIMENSIONS}
+    result = event_store.query(filters, since=since, until=until, limit=limit)
+    return jsonify({
+        'success': True,
+        'count': result['count'],
+        'returned': len(result['events']),
+        'events': result['events'],
+        'store': event_store.stats()
+    })
+
+@app.route('/agent/stream', methods=['GET'])
+def stream_changes():
+    """Server-sent events stream of stage transitions and new/updated decisions"""
+    since = parse_since(request.args.get('since') or request.headers.get('Last-Event-ID'))
+    return Response(sse_events(feed, since), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+agent_status['warm_start']['api_ready_ms'] = round((time.monotonic() - _module_started) * 1000, 1)
@@ -0,0 +1,357 @@
+"""
+SlayPay AI Agent - Archive Module
+Columnar Parquet archive of observed events and decisions, partitioned by day
+
+Rows are handed to a background writer thread, buffered per table and day, and
+written as zstd-compressed Parquet files under
+archive/<table>/date=YYYY-MM-DD/. Archival needs pyarrow; without it the agent
+runs as before with archival disabled.
+
+The decisions table is append-only: a decision gets a row when it is created
+and another each time it changes (coalesced update, outcome scored, retired),
+each stamped with updated_at and a per-writer version that orders versions
+written in the same millisecond. latest_decisions() keeps the newest row per
+decision.
+
+Usage:
+    python archive.py events --since 2026-10-01 --until 2026-10-31
+    python archive.py decisions --columns decision_id,entity,severity,outcome
+"""
+
+from typing import Dict, List, Optional
+from datetime import datetime, timezone
+import argparse
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # optional - archival is disabled without pyarrow
+    pa = ds = pq = None
+
+from store import parse_event_time
+
+ARCHIVE_DIR = "archive"
+ARCHIVE_FLUSH_ROWS = 50000     # rows buffered per table before a file is written
+ARCHIVE_FLUSH_SECONDS = 900    # ...or after this long, so files stay few and large
+ARCHIVE_QUEUE_SIZE = 256       # batches waiting for the writer; more are dropped
+COMPRESSION = 'zstd'
+
+# Why a decision row was written
+DECISION_CREATED = 'created'
+DECISION_UPDATED = 'updated'   # coalesced into the live decision again
+DECISION_SCORED = 'scored'
+DECISION_RETIRED = 'retired'   # no longer one of the current decisions
+
+# Low-cardinality string columns, read back as dictionary (pandas categorical)
+DICTIONARY_COLUMNS = {
+    'events': ['bank', 'method', 'status', 'error_code'],
+    'decisions': ['entity', 'entity_type', 'severity', 'risk', 'outcome', 'issue_key', 'change']
+}
+
+def _schemas() -> Dict[str, 'pa.Schema']:
+    timestamp = pa.timestamp('ms', tz='UTC')
+    window = [('observed_at', timestamp), ('window_start', timestamp), ('window_end', timestamp)]
+    return {
+        'events': pa.schema([
+            ('transaction_id', pa.string()),
+            ('timestamp', timestamp),
+            ('user_id', pa.string()),
+            ('amount', pa.float64()),
+            ('bank', pa.string()),
+            ('method', pa.string()),
+            ('status', pa.string()),
+            ('latency', pa.float32()),
+            ('error_code', pa.string()),
+            ('observed_at', timestamp)
+        ]),
+        'decisions': pa.schema([
+            ('decision_id', pa.string()),
+            ('timestamp', timestamp),
+            ('updated_at', timestamp),
+            ('version', pa.int64()),
+            ('change', pa.string()),
+            ('issue_key', pa.string()),
+            ('entity', pa.string()),
+            ('entity_type', pa.string()),
+            ('severity', pa.string()),
+            ('issue', pa.string()),
+            ('action', pa.string()),
+            ('confidence', pa.int16()),
+            ('risk', pa.string()),
+            ('outcome', pa.string()),
+            ('reward', pa.float32()),
+            ('occurrence_count', pa.int32()),
+            ('supersedes', pa.string()),
+            ('evidence', pa.string()),  # JSON
+            *window
+        ])
+    }
+
+SCHEMAS = _schemas() if pa is not None else {}
+
+def _ms(value) -> Optional[int]:
+    """ISO string / epoch seconds -> epoch milliseconds (None if missing)"""
+    seconds = parse_event_time(value)
+    return int(seconds * 1000) if seconds else None
+
+def _local_ms(value) -> Optional[int]:
+    """Naive local isoformat timestamp (as decisions carry) -> epoch milliseconds"""
+    try:
+        return int(datetime.fromisoformat(value).timestamp() * 1000)  # naive means local time
+    except (TypeError, ValueError):
+        return _ms(value)
+
+def _day(ms: Optional[int]) -> str:
+    seconds = ms / 1000 if ms else time.time()
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).strftime('%Y-%m-%d')
+
+def event_row(event: Dict, window: Dict) -> Dict:
+    latency = event.get('latency')
+    return {
+        'transaction_id': event.get('transaction_id'),
+        'timestamp': _ms(event.get('timestamp')),
+        'user_id': event.get('user_id'),
+        'amount': float(event['amount']) if event.get('amount') is not None else None,
+        'bank': event.get('bank'),
+        'method': event.get('method'),
+        'status': event.get('status'),
+        'latency': float(latency) if latency is not None else None,
+        'error_code': event.get('error_code'),
+        'observed_at': _ms(window.get('observed_at'))
+    }
+
+def decision_row(decision: Dict, window: Dict) -> Dict:
+    persistence = decision.get('persistence') or {}
+    evidence = decision.get('evidence')
+    return {
+        'decision_id': decision.get('decision_id'),
+        'timestamp': _local_ms(decision.get('timestamp')),
+        'updated_at': window.get('updated_at'),
+        'version': window.get('version'),
+        'change': window.get('change'),
+        'issue_key': decision.get('issue_key'),
+        'entity': decision.get('entity'),
+        'entity_type': decision.get('entity_type'),
+        'severity': decision.get('severity'),
+        'issue': decision.get('issue'),
+        'action': decision.get('action'),
+        'confidence': decision.get('confidence'),
+        'risk': decision.get('risk'),
+        'outcome': decision.get('outcome'),
+        'reward': decision.get('reward'),
+        'occurrence_count': decision.get('occurrence_count') or persistence.get('occurrence_count'),
+        'supersedes': decision.get('supersedes'),
+        'evidence': json.dumps(evidence, default=str) if evidence is not None else None,
+        'observed_at': _ms(window.get('observed_at')),
+        'window_start': _ms(window.get('start')),
+        'window_end': _ms(window.get('end'))
+    }
+
+class ArchiveWriter:
+    """
+    Background Parquet writer.
+    
+    add_events()/add_decisions() only enqueue (never block the agent loop); the
+    writer thread converts rows, buffers them per table and day, and writes a
+    file when a buffer reaches ARCHIVE_FLUSH_ROWS rows or ARCHIVE_FLUSH_SECONDS
+    age, and on stop(). Files are written to a temp name and renamed.
+    """
+    
+    def __init__(self, root: str = ARCHIVE_DIR, flush_rows: int = ARCHIVE_FLUSH_ROWS,
+                 flush_seconds: float = ARCHIVE_FLUSH_SECONDS, queue_size: int = ARCHIVE_QUEUE_SIZE):
+        self.root = root
+        self.enabled = pa is not None
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.buffers = {table: {} for table in DICTIONARY_COLUMNS}  # table -> day -> rows
+        self.buffered_at = {}  # (table, day) -> monotonic time of the oldest buffered row
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.sequence = 0
+        self.versions = itertools.count(1)  # decision versions, in submission order
+        self.stats = {
+            'rows_written': dict.fromkeys(DICTIONARY_COLUMNS, 0),
+            'files_written': 0,
+            'dropped_batches': 0,
+            'errors': 0,
+            'last_error': None
+        }
+    
+    def start(self):
+        if not self.enabled:
+            print("📦 pyarrow not installed - event/decision archival disabled")
+            return
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True, name='agent-archive')
+            self.thread.start()
+    
+    def stop(self, timeout: float = 30.0):
+        """Write out everything buffered and stop the writer"""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+    
+    def add_events(self, events: List[Dict], window: Dict):
+        """Queue newly observed events (window: this cycle's observed_at/start/end)"""
+        if events:
+            self._submit('events', events, window)
+    
+    def add_decisions(self, decisions: List[Dict], window: Dict, change: str = DECISION_CREATED):
+        """
+        Queue a version of each decision (copied, since live decisions keep changing)
+        
+        Args:
+            window: the cycle's observed_at/start/end
+            change: DECISION_CREATED, DECISION_UPDATED, DECISION_SCORED or DECISION_RETIRED
+        """
+        if decisions:
+            self._submit('decisions', [dict(d) for d in decisions],
+                         {**window, 'change': change, 'updated_at': int(time.time() * 1000),
+                          'version': next(self.versions)})
+    
+    def _submit(self, table: str, items: List[Dict], window: Dict):
+        if not self.enabled or self.stop_event.is_set():
+            return
+        try:
+            self.queue.put_nowait((table, items, dict(window)))
+        except queue.Full:
+            self.stats['dropped_batches'] += 1
+    
+    def _run(self):
+        convert = {'events': event_row, 'decisions': decision_row}
+        while True:
+            try:
+                table, items, window = self.queue.get(timeout=1.0)
+            except queue.Empty:
+                if self.stop_event.is_set():
+                    self._flush(force=True)
+                    break
+            else:
+                for item in items:
+                    row = convert[table](item, window)
+                    day = _day(row['timestamp'] if table == 'events' else row['observed_at'])
+                    self.buffers[table].setdefault(day, []).append(row)
+                    self.buffered_at.setdefault((table, day), time.monotonic())
+            self._flush()
+    
+    def _flush(self, force: bool = False):
+        now = time.monotonic()
+        for table, days in self.buffers.items():
+            for day in list(days):
+                rows = days[day]
+                if force or len(rows) >= self.flush_rows or now - self.buffered_at[(table, day)] >= self.flush_seconds:
+                    del days[day]
+                    del self.buffered_at[(table, day)]
+                    self._write(table, day, rows)
+    
+    def _write(self, table: str, day: str, rows: List[Dict]):
+        directory = os.path.join(self.root, table, f"date={day}")
+        self.sequence += 1
+        path = os.path.join(directory, f"part-{int(time.time() * 1000)}-{self.sequence:04d}.parquet")
+        try:
+            os.makedirs(directory, exist_ok=True)
+            pq.write_table(pa.Table.from_pylist(rows, schema=SCHEMAS[table]), f"{path}.tmp", compression=COMPRESSION)
+            os.replace(f"{path}.tmp", path)
+            self.stats['rows_written'][table] += len(rows)
+            self.stats['files_written'] += 1
+        except Exception as e:
+            self.stats['errors'] += 1
+            self.stats['last_error'] = str(e)
+            print(f"Error writing archive file {path}: {e}")
+    
+    def report(self) -> Dict:
+        return {
+            'enabled': self.enabled,
+            'queued_batches': self.queue.qsize(),
+            'buffered_rows': {table: sum(len(rows) for rows in days.values()) for table, days in self.buffers.items()},
+            **self.stats
+        }
+
+def load(table: str, since: Optional[str] = None, until: Optional[str] = None,
+         columns: Optional[List[str]] = None, root: str = ARCHIVE_DIR) -> 'pa.Table':
+    """
+    Read an archived table as one Arrow table.
+    
+    Args:
+        table: 'events' or 'decisions'
+        since, until: inclusive day bounds (YYYY-MM-DD); only matching partitions are read
+        columns: subset of columns to read
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is required to load the archive")
+    if table not in SCHEMAS:
+        raise ValueError(f"Unknown archive table: {table}")
+    directory = os.path.join(root, table)
+    if not os.path.isdir(directory):
+        return SCHEMAS[table].empty_table().select(columns or SCHEMAS[table].names)
+    
+    partitioning = ds.partitioning(pa.schema([('date', pa.string())]), flavor='hive')
+    dataset = ds.dataset(directory, format=ds.ParquetFileFormat(
+        read_options={'dictionary_columns': DICTIONARY_COLUMNS[table]}), partitioning=partitioning)
+    condition = None
+    if since:
+        condition = ds.field('date') >= since
+    if until:
+        condition = ds.field('date') <= until if condition is None else condition & (ds.field('date') <= until)
+    return dataset.to_table(columns=columns or SCHEMAS[table].names, filter=condition)
+
+def load_frame(table: str, **kwargs):
+    """Archived table as a pandas DataFrame (columns converted without consolidating blocks)"""
+    return load(table, **kwargs).to_pandas(split_blocks=True, self_destruct=True)
+
+def load_arrays(table: str, **kwargs) -> Dict:
+    """Archived table as NumPy arrays (numeric columns without nulls are zero-copy views)"""
+    arrow_table = load(table, **kwargs).combine_chunks()
+    return {name: column.to_numpy() for name, column in zip(arrow_table.column_names, arrow_table.columns)}
+
+def latest_decisions(decisions: 'pa.Table') -> 'pa.Table':
+    """Newest archived row of each decision (needs the decision_id, updated_at and version columns)"""
+    ordered = decisions.sort_by([('updated_at', 'descending'), ('version', 'descending')])
+    seen = set()
+    keep = [i for i, decision_id in enumerate(ordered['decision_id'].to_pylist())
+            if not (decision_id in seen or seen.add(decision_id))]
+    return ordered.take(keep)
+
+def events_for_decision(events: 'pa.Table', decision: Dict) -> 'pa.Table':
+    """
+    Events from the observation window a decision was made on (same entity,
+    timestamp within its window_start..window_end)
+    
+    Args:
+        events: loaded 'events' table
+        decision: a row of the 'decisions' table (as a dict)
+    """
+    import pyarrow.compute as pc
+    mask = pc.and_(pc.greater_equal(events['timestamp'], decision['window_start']),
+                   pc.less_equal(events['timestamp'], decision['window_end']))
+    if decision.get('entity_type') in ('bank', 'method'):
+        mask = pc.and_(mask, pc.equal(events[decision['entity_type']].cast(pa.string()), decision['entity']))
+    return events.filter(mask)
+
+def main():
+    parser = argparse.ArgumentParser(description="Load and summarize the agent's Parquet archive")
+    parser.add_argument('table', choices=['events', 'decisions'])
+    parser.add_argument('--root', default=ARCHIVE_DIR)
+    parser.add_argument('--since', help="first day (YYYY-MM-DD)")
+    parser.add_argument('--until', help="last day (YYYY-MM-DD)")
+    parser.add_argument('--columns', help="comma-separated columns to load")
+    args = parser.parse_args()
+    
+    started = time.perf_counter()
+    arrow_table = load(args.table, since=args.since, until=args.until,
+                       columns=args.columns.split(',') if args.columns else None, root=args.root)
+    elapsed = time.perf_counter() - started
+    print(f"📦 {arrow_table.num_rows:,} {args.table} rows, {arrow_table.num_columns} columns, "
+          f"{arrow_table.nbytes / 1e6:.1f} MB in memory, loaded in {elapsed:.2f}s")
+    print(arrow_table.slice(0, 5).to_pylist())
+
+if __name__ == '__main__':
+    main()
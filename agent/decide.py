@@ -5,6 +5,38 @@ Proposes actions based on detected anomalies with severity and persistence aware
 
 from typing import Dict, List
 from datetime import datetime
+from reason import classify_severity, FAILURE_RATE_THRESHOLD, MIN_SAMPLE_SIZE
+from routing import RoutingTable, RouteEntry, CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN, CIRCUIT_OPEN
+
+SEVERITY_RANK = {'LOW': 0, 'MEDIUM': 1, 'HIGH': 2}
+
+# Fields of a live decision refreshed in place when a coalesced update arrives
+COALESCED_FIELDS = ('issue', 'action', 'confidence', 'risk', 'reasoning', 'severity', 'persistence', 'evidence')
+
+# Routing state per severity - mirrors the prose actions below
+# (HIGH: route to backups, MEDIUM: reduce allocation by 40%, LOW: monitor only)
+ROUTING_BY_SEVERITY = {
+    'HIGH': (0.0, CIRCUIT_OPEN),
+    'MEDIUM': (0.6, CIRCUIT_HALF_OPEN),
+    'LOW': (1.0, CIRCUIT_CLOSED)
+}
+
+def make_decision_id(entity: str) -> str:
+    """Build a decision ID (millisecond timestamp so same-second decisions don't collide)"""
+    return f"DEC_{int(datetime.now().timestamp() * 1000)}_{entity}"
+
+def sampling_note(anomaly: Dict) -> str:
+    """Reasoning suffix for anomalies estimated from a load-shedding sample"""
+    if 'failure_rate_ci' not in anomaly:
+        return ""
+    low, high = anomaly['failure_rate_ci']
+    return f" Estimated from a stratified sample of {anomaly['sampled']} transactions (95% CI {low}-{high}%)."
+
+def impact_note(anomaly: Dict) -> str:
+    """Reasoning suffix with the value of failed payments and users affected"""
+    if not anomaly.get('value_at_risk'):
+        return ""
+    return f" ₹{anomaly['value_at_risk']:,.0f} in failed payments across ~{anomaly.get('affected_users', 0)} users."
 
 def propose_action_for_bank_anomaly(anomaly: Dict, persistence: Dict = None) -> Dict:
     """Propose action for bank-specific anomaly"""
@@ -30,6 +62,7 @@ def propose_action_for_bank_anomaly(anomaly: Dict, persistence: Dict = None) ->
     
     # Build reasoning with persistence info
     reasoning = f"Based on {sample_size} transactions, {bank} showing {failure_rate}% failure rate (baseline: {anomaly['threshold']}%). {failures_count} transactions failed."
+    reasoning += impact_note(anomaly) + sampling_note(anomaly)
     
     if persistence:
         status = persistence.get('status', 'NEW')
@@ -46,7 +79,7 @@ def propose_action_for_bank_anomaly(anomaly: Dict, persistence: Dict = None) ->
     reasoning += f" Severity: {severity}."
     
     return {
-        'decision_id': f"DEC_{int(datetime.now().timestamp())}_{bank}",
+        'decision_id': make_decision_id(bank),
         'timestamp': datetime.now().isoformat(),
         'issue': f"Detected {bank} failure spike ({failure_rate}%)",
         'action': action,
@@ -84,6 +117,7 @@ def propose_action_for_method_anomaly(anomaly: Dict, persistence: Dict = None) -
     
     # Build reasoning with persistence info
     reasoning = f"{method} showing elevated failure rate of {failure_rate}% across {sample_size} transactions. {failures_count} transactions failed."
+    reasoning += impact_note(anomaly) + sampling_note(anomaly)
     
     if persistence:
         status = persistence.get('status', 'NEW')
@@ -100,7 +134,7 @@ def propose_action_for_method_anomaly(anomaly: Dict, persistence: Dict = None) -
     reasoning += f" Severity: {severity}."
     
     return {
-        'decision_id': f"DEC_{int(datetime.now().timestamp())}_{method}",
+        'decision_id': make_decision_id(method),
         'timestamp': datetime.now().isoformat(),
         'issue': f"Detected {method} payment failures ({failure_rate}%)",
         'action': action,
@@ -146,7 +180,7 @@ def propose_action_for_error_pattern(pattern: Dict, persistence: Dict = None) ->
             reasoning += " Newly identified pattern."
     
     return {
-        'decision_id': f"DEC_{int(datetime.now().timestamp())}_E",
+        'decision_id': make_decision_id(error_code),
         'timestamp': datetime.now().isoformat(),
         'issue': f"Repeated {error_code} errors detected",
         'action': action,
@@ -160,38 +194,90 @@ def propose_action_for_error_pattern(pattern: Dict, persistence: Dict = None) ->
         'outcome': 'pending'
     }
 
+def build_evidence(anomaly: Dict) -> Dict:
+    """Structured evidence carried on a decision (refreshed on every coalesced update)"""
+    return {key: value for key, value in anomaly.items() if key not in ('type', 'entity', 'entity_type', 'severity')}
+
+def coalesce_decision(proposed: Dict, issue_key: str, anomaly: Dict, memory=None) -> Dict:
+    """
+    Merge a freshly proposed decision into the live decision for its issue_key.
+    
+    The live decision is updated in place with the new evidence and occurrence
+    count. A new decision is only emitted when there is no live decision or the
+    severity escalates above the live decision's peak.
+    """
+    proposed['issue_key'] = issue_key
+    proposed['evidence'] = build_evidence(anomaly)
+    
+    live = memory.get_live_decision(issue_key) if memory else None
+    if live is not None:
+        peak = live.get('peak_severity', live.get('severity', 'LOW'))
+        if SEVERITY_RANK.get(proposed['severity'], 0) <= SEVERITY_RANK.get(peak, 0):
+            for field in COALESCED_FIELDS:
+                live[field] = proposed[field]
+            live['occurrence_count'] = live.get('occurrence_count', 1) + 1
+            live['last_updated'] = proposed['timestamp']
+            return live
+        proposed['supersedes'] = live.get('decision_id')
+    
+    proposed['peak_severity'] = proposed['severity']
+    proposed['occurrence_count'] = 1
+    proposed['last_updated'] = proposed['timestamp']
+    return proposed
+
+# Decision rules per analysis category: (proposal function, issue key format)
+# Findings in categories without a rule are reported but produce no decision.
+DECISION_RULES = {
+    'bank_anomalies': (propose_action_for_bank_anomaly, "{entity}_failure_spike"),
+    'method_anomalies': (propose_action_for_method_anomaly, "{entity}_method_failures"),
+    'error_patterns': (propose_action_for_error_pattern, "{error_code}_repeated_error")
+}
+
 def generate_decisions(analysis: Dict, memory=None) -> List[Dict]:
     """Generate actionable decisions from analysis with persistence tracking"""
     decisions = []
     
-    # Process bank anomalies
-    for anomaly in analysis.get('bank_anomalies', []):
-        persistence = None
-        if memory:
-            issue_key = f"{anomaly['entity']}_failure_spike"
-            persistence = memory.track_issue(issue_key, anomaly)
-        
-        decision = propose_action_for_bank_anomaly(anomaly, persistence)
-        decisions.append(decision)
-    
-    # Process method anomalies
-    for anomaly in analysis.get('method_anomalies', []):
-        persistence = None
-        if memory:
-            issue_key = f"{anomaly['entity']}_method_failures"
-            persistence = memory.track_issue(issue_key, anomaly)
-        
-        decision = propose_action_for_method_anomaly(anomaly, persistence)
-        decisions.append(decision)
-    
-    # Process error patterns
-    for pattern in analysis.get('error_patterns', []):
-        persistence = None
-        if memory:
-            issue_key = f"{pattern['error_code']}_repeated_error"
-            persistence = memory.track_issue(issue_key, pattern)
-        
-        decision = propose_action_for_error_pattern(pattern, persistence)
-        decisions.append(decision)
+    for category, (propose, issue_key_format) in DECISION_RULES.items():
+        for anomaly in analysis.get(category, []):
+            persistence = None
+            issue_key = issue_key_format.format(**anomaly)
+            if memory:
+                persistence = memory.track_issue(issue_key, anomaly)
+            
+            decision = propose(anomaly, persistence)
+            decisions.append(coalesce_decision(decision, issue_key, anomaly, memory))
     
     return decisions
+
+def _route_entry(stats: Dict, severity: str = None) -> RouteEntry:
+    """Build a route entry from aggregate counts and (optional) anomaly severity"""
+    total = stats.get('total', 0)
+    failure_rate = round(stats.get('failures', 0) / total * 100, 2) if total else 0.0
+    ci = stats.get('failure_rate_ci')
+    if severity is None and total >= MIN_SAMPLE_SIZE and (ci[0] if ci else failure_rate) > FAILURE_RATE_THRESHOLD:
+        severity = classify_severity(failure_rate, total, FAILURE_RATE_THRESHOLD, ci)
+    weight, circuit = ROUTING_BY_SEVERITY.get(severity, (1.0, CIRCUIT_CLOSED))
+    return RouteEntry(weight, circuit, failure_rate, total, severity)
+
+def compile_routing_table(analysis: Dict, structured_data: Dict, previous: RoutingTable) -> RoutingTable:
+    """
+    Compile machine-readable routing weights and circuit states for this cycle.
+    
+    Banks and methods take the severity of their detected anomaly; bank+method
+    pairs are classified from their own aggregates. Entities without an anomaly
+    are classified the same way the detectors would. If no weight or circuit
+    changed, `previous` is returned as is, so its version (and the ETag) only
+    moves when routing actually changes.
+    """
+    bank_severity = {a['entity']: a.get('severity', 'MEDIUM').upper() for a in analysis.get('bank_anomalies', [])}
+    method_severity = {a['entity']: a.get('severity', 'MEDIUM').upper() for a in analysis.get('method_anomalies', [])}
+    
+    banks = {bank: _route_entry(stats, bank_severity.get(bank))
+             for bank, stats in structured_data.get('by_bank', {}).items()}
+    methods = {method: _route_entry(stats, method_severity.get(method))
+               for method, stats in structured_data.get('by_method', {}).items()}
+    pairs = {pair: _route_entry(stats) for pair, stats in structured_data.get('by_pair', {}).items()}
+    
+    if previous.same_routes(banks, methods, pairs):
+        return previous
+    return RoutingTable(previous.version + 1, datetime.now().isoformat(), banks, methods, pairs)
@@ -0,0 +1,288 @@
+"""
+SlayPay AI Agent - Load Harness
+End-to-end run of the real agent loop against the stand-in backend under
+concurrent polling of the agent API
+
+Everything runs offline in one process: the stand-in backend and the agent
+API are served on ephemeral localhost ports, the agent loop runs with a short
+cadence, and client threads poll /agent/insights, /agent/decisions and
+/agent/workflow_state as fast as they can. Reports API p50/p99 latency, cycle
+durations and how long the agent took to detect each scenario incident.
+
+Usage:
+    python loadtest.py --duration 120 --clients 50 --interval 5
+    python loadtest.py --scenario flapping --rate 100 --deltas --json results.json
+"""
+
+from typing import Dict, List, Optional
+import argparse
+import contextlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+from werkzeug.serving import make_server
+
+from standin_backend import EventGenerator, create_app, SCENARIOS, DEFAULT_RATE
+
+ENDPOINTS = ('/agent/insights', '/agent/decisions', '/agent/workflow_state')
+DELTA_ENDPOINTS = ('/agent/insights', '/agent/workflow_state')  # support ?since=
+DEFAULT_DURATION = 120  # seconds
+DEFAULT_CLIENTS = 50
+DEFAULT_INTERVAL = 5    # agent cycle interval during the run (seconds)
+SAMPLE_SECONDS = 0.1    # how often the monitor samples agent state
+REQUEST_TIMEOUT = 10
+DETECTION_SEVERITIES = ('MEDIUM', 'HIGH')  # decisions that count as detecting an incident
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile (None for no values)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+def _latency_summary(values: List[float]) -> Dict:
+    return {
+        'count': len(values),
+        'p50_ms': _round(percentile(values, 50)),
+        'p99_ms': _round(percentile(values, 99)),
+        'max_ms': _round(max(values) if values else None)
+    }
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 1) if value is not None else None
+
+class ServerThread:
+    """Serve a WSGI app on an ephemeral localhost port in a background thread"""
+    
+    def __init__(self, app, name: str):
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True, name=name)
+    
+    def start(self):
+        self.thread.start()
+    
+    def stop(self):
+        self.server.shutdown()
+
+def poll_api(base_url: str, client_id: int, stop_event: threading.Event, use_deltas: bool) -> Dict:
+    """
+    One polling client: round-robins the endpoints until stopped.
+    
+    Returns:
+        {'latencies': {endpoint: [ms]}, 'errors': {endpoint: count}}
+    """
+    session = requests.Session()
+    latencies = {endpoint: [] for endpoint in ENDPOINTS}
+    errors = dict.fromkeys(ENDPOINTS, 0)
+    versions = {}
+    i = client_id
+    while not stop_event.is_set():
+        endpoint = ENDPOINTS[i % len(ENDPOINTS)]
+        i += 1
+        params = {'since': versions[endpoint]} if use_deltas and endpoint in versions else None
+        started = time.perf_counter()
+        try:
+            response = session.get(f"{base_url}{endpoint}", params=params, timeout=REQUEST_TIMEOUT)
+            body = response.json()
+        except (requests.RequestException, ValueError):
+            errors[endpoint] += 1
+            continue
+        latencies[endpoint].append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            errors[endpoint] += 1
+        elif use_deltas and endpoint in DELTA_ENDPOINTS and 'version' in body:
+            versions[endpoint] = body['version']
+    return {'latencies': latencies, 'errors': errors}
+
+def monitor_agent(agent, generator: EventGenerator, stop_event: threading.Event) -> Dict:
+    """
+    Sample agent state while the run is going.
+    
+    Records every completed cycle's duration and, for each scenario incident,
+    the first time a MEDIUM/HIGH decision names one of its banks or methods.
+    """
+    cycles = []
+    seen_cycles = 0
+    detections = {incident['phase']: None for incident in generator.incidents()}
+    onset_cycles = {}  # phase -> cycles completed when the incident started
+    while not stop_event.wait(SAMPLE_SECONDS):
+        stats = agent.scheduler.stats
+        if stats['cycles'] > seen_cycles:
+            seen_cycles = stats['cycles']
+            cycles.append(stats['last_cycle_ms'])
+        
+        now = time.time()
+        for incident in generator.incidents():
+            if detections[incident['phase']] is not None or now < incident['onset']:
+                continue
+            onset_cycles.setdefault(incident['phase'], seen_cycles)
+            entities = set(incident['banks']) | set(incident['methods'])
+            if any(d.get('entity') in entities and str(d.get('severity', '')).upper() in DETECTION_SEVERITIES
+                   for d in list(agent.current_decisions)):
+                detections[incident['phase']] = {
+                    'delay_seconds': round(now - incident['onset'], 1),
+                    'cycles_after_onset': seen_cycles - onset_cycles[incident['phase']]
+                }
+    return {'cycle_ms': cycles, 'detections': detections}
+
+def run(scenario: str, rate: float, phase_seconds: float, duration: float, clients: int,
+        interval: float, use_deltas: bool = False, seed: Optional[int] = None, verbose: bool = False,
+        shed_budget_ms: Optional[float] = None) -> Dict:
+    """Run one load test and return the results"""
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    
+    generator = EventGenerator(scenario, rate=rate, phase_seconds=phase_seconds, seed=seed)
+    backend = ServerThread(create_app(generator), 'standin-backend')
+    backend.start()
+    
+    # The agent reads BACKEND_URL and writes its memory/snapshot files into the
+    # working directory at import time, so point both at this run before importing it
+    workdir = tempfile.mkdtemp(prefix='slaypay-loadtest-')
+    os.chdir(workdir)
+    os.environ['BACKEND_URL'] = backend.url
+    import agent
+    from scheduler import CycleScheduler
+    agent.scheduler = CycleScheduler(base_interval=interval, min_interval=interval / 3, max_interval=interval * 2)
+    if shed_budget_ms is not None:
+        agent.shedder.budget_ms = shed_budget_ms
+    
+    api = ServerThread(agent.app, 'agent-api')
+    api.start()
+    
+    log_path = os.path.join(workdir, 'agent.log')
+    with open(log_path, 'w') as log, contextlib.redirect_stdout(sys.stdout if verbose else log):
+        stop_event = threading.Event()
+        results = {}
+        
+        generator.start()
+        agent_thread = threading.Thread(target=agent.agent_loop, daemon=True, name='agent-loop')
+        agent_thread.start()
+        
+        def _collect(name, fn, *args):
+            results[name] = fn(*args)
+        
+        workers = [threading.Thread(target=_collect, args=('monitor', monitor_agent, agent, generator, stop_event),
+                                    daemon=True)]
+        workers += [threading.Thread(target=_collect, args=(f'client_{i}', poll_api, api.url, i, stop_event, use_deltas),
+                                     daemon=True) for i in range(clients)]
+        for worker in workers:
+            worker.start()
+        
+        time.sleep(duration)
+        stop_event.set()
+        for worker in workers:
+            worker.join(REQUEST_TIMEOUT + 1)
+        
+        agent.agent_status['running'] = False
+        agent.pipeline.stop()
+        agent.scheduler.stop()
+        agent_thread.join(REQUEST_TIMEOUT + 1)  # lets the loop flush the archive on its way out
+        generator.stop()
+        api.stop()
+        backend.stop()
+    
+    latencies = {endpoint: [] for endpoint in ENDPOINTS}
+    errors = dict.fromkeys(ENDPOINTS, 0)
+    for name, result in results.items():
+        if name.startswith('client_'):
+            for endpoint in ENDPOINTS:
+                latencies[endpoint].extend(result['latencies'][endpoint])
+                errors[endpoint] += result['errors'][endpoint]
+    monitor = results.get('monitor', {'cycle_ms': [], 'detections': {}})
+    scheduler_stats = agent.scheduler.stats
+    
+    incidents = []
+    for incident in generator.incidents():
+        incidents.append({
+            'preset': incident['preset'],
+            'onset_seconds': round(incident['onset'] - generator.started_at, 1),
+            'pairs': incident['pairs'],
+            'detected': monitor['detections'].get(incident['phase'])
+        })
+    
+    return {
+        'config': {
+            'scenario': scenario, 'rate': rate, 'phase_seconds': phase_seconds, 'duration': duration,
+            'clients': clients, 'interval': interval, 'deltas': use_deltas, 'shed_budget_ms': agent.shedder.budget_ms
+        },
+        'api': {
+            endpoint: dict(_latency_summary(latencies[endpoint]), errors=errors[endpoint],
+                           requests_per_second=round(len(latencies[endpoint]) / duration, 1))
+            for endpoint in ENDPOINTS
+        },
+        'api_all': _latency_summary([ms for values in latencies.values() for ms in values]),
+        'cycles': dict(_latency_summary(monitor['cycle_ms']),
+                       skipped_ticks=scheduler_stats['skipped_ticks'],
+                       missed_deadlines=sum(scheduler_stats['missed_deadlines'].values()),
+                       max_lag_ms=scheduler_stats['max_lag_ms']),
+        'queues': agent.pipeline.report(),
+        'shedding': agent.shedder.report(),
+        'incidents': incidents,
+        'events_generated': generator.metrics['total'],
+        'log': log_path
+    }
+
+def print_report(results: Dict):
+    config = results['config']
+    print(f"\n📊 {config['scenario']} scenario, {config['rate']:g} events/s, {config['clients']} clients, "
+          f"{config['duration']:g}s, {config['interval']:g}s cycles{' (delta polling)' if config['deltas'] else ''}\n")
+    
+    print(f"{'endpoint':<24}{'requests':>10}{'req/s':>9}{'errors':>8}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for endpoint, stats in list(results['api'].items()) + [('all', dict(results['api_all'], errors='', requests_per_second=''))]:
+        print(f"{endpoint:<24}{stats['count']:>10}{stats['requests_per_second']:>9}{stats['errors']:>8}"
+              f"{stats['p50_ms'] or 0:>9.1f}{stats['p99_ms'] or 0:>9.1f}{stats['max_ms'] or 0:>9.1f}")
+    
+    cycles = results['cycles']
+    print(f"\nCycles: {cycles['count']} completed, duration p50 {cycles['p50_ms'] or 0:.0f}ms / "
+          f"p99 {cycles['p99_ms'] or 0:.0f}ms / max {cycles['max_ms'] or 0:.0f}ms, "
+          f"{cycles['skipped_ticks']} skipped ticks, {cycles['missed_deadlines']} missed deadlines, "
+          f"max lag {cycles['max_lag_ms']:.0f}ms")
+    print("Queues: " + ", ".join(f"{stage} max depth {q['max_depth']}/{q['capacity']}, blocked {q['blocked_ms']:.0f}ms"
+                                 for stage, q in results['queues'].items()))
+    shedding = results['shedding']
+    print(f"Load shedding: {shedding['shed_cycles']} of {cycles['count']} cycles sampled, "
+          f"budget {shedding['budget_ms']:g}ms, cost {shedding['cost_per_event_us'] or 0:g}us/event")
+    
+    for incident in results['incidents']:
+        detected = incident['detected']
+        outcome = (f"detected after {detected['delay_seconds']:.1f}s ({detected['cycles_after_onset']} cycles run)"
+                   if detected else "not detected")
+        print(f"Incident at +{incident['onset_seconds']:g}s ({incident['preset']}: {', '.join(incident['pairs'])}): {outcome}")
+    if not results['incidents']:
+        print("No incidents in this scenario")
+    print(f"\nAgent log: {results['log']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the agent loop and API against the stand-in backend")
+    parser.add_argument('--scenario', default='incident', choices=sorted(SCENARIOS))
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE, help="backend events per second")
+    parser.add_argument('--phase-seconds', type=float, help="scenario phase length (default: a third of the run)")
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION, help="run length in seconds")
+    parser.add_argument('--clients', type=int, default=DEFAULT_CLIENTS, help="concurrent polling clients")
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, help="agent cycle interval in seconds")
+    parser.add_argument('--deltas', action='store_true', help="poll with ?since= like the ops dashboard")
+    parser.add_argument('--shed-budget-ms', type=float, help="agent aggregation budget per cycle (low values force load shedding)")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--json', help="also write the results to this file")
+    parser.add_argument('--verbose', action='store_true', help="show agent output instead of logging it")
+    args = parser.parse_args()
+    
+    json_path = os.path.abspath(args.json) if args.json else None
+    results = run(args.scenario, args.rate, args.phase_seconds or args.duration / 3, args.duration,
+                  args.clients, args.interval, use_deltas=args.deltas, seed=args.seed, verbose=args.verbose,
+                  shed_budget_ms=args.shed_budget_ms)
+    print_report(results)
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -14,7 +14,6 @@ if __name__ == '__main__':
 ║                                                            ║
 ╚═══════════════════════════════════════════════════════════╝
     """)
-    m
     # Start agent loop in background thread
     agent_thread = threading.Thread(target=agent_loop, daemon=True)
     agent_thread.start()
@@ -4,50 +4,278 @@ Tracks past decisions and their outcomes for learning
 Also tracks issue persistence across cycles
 """
 
-from typing import Dict, List
+from typing import Dict, List, Optional
+from collections import deque
 from datetime import datetime
 import json
 import os
+import threading
+import time
 
 MEMORY_FILE = "agent_memory.json"
+MAX_DECISIONS = 100
+ISSUE_IDLE_MINUTES = 5  # unresolved issues not seen for this long are resolved
+
+# Rolling stats windows: (name, span in seconds, bucket width in seconds)
+STATS_WINDOWS = (
+    ('1h', 3600, 60),
+    ('24h', 86400, 900),
+    ('7d', 604800, 3600),
+)
+
+def _to_epoch(iso_timestamp: Optional[str]) -> float:
+    """Convert an isoformat timestamp to epoch seconds (now if missing/invalid)"""
+    if not iso_timestamp:
+        return time.time()
+    try:
+        return datetime.fromisoformat(iso_timestamp).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+def _is_completed(decision: Dict) -> bool:
+    """Conclusively scored (an 'inconclusive' score is neither pending nor completed)"""
+    return decision.get('outcome') not in ['pending', 'inconclusive', None]
+
+def _is_successful(decision: Dict) -> bool:
+    return _is_completed(decision) and decision.get('reward', 0) > 0
+
+class RollingWindow:
+    """
+    Time-bucketed decision counters with running totals.
+    
+    Counts are keyed by (entity_type, peak severity). Buckets falling out of the
+    window are subtracted from the totals as they expire, so reads only touch
+    the handful of keys instead of every recorded decision. Reads expire
+    buckets too, so every access holds the window's lock.
+    """
+    
+    FIELDS = ('decisions', 'completed', 'successful')
+    
+    def __init__(self, span_seconds: int, bucket_seconds: int):
+        self.span_seconds = span_seconds
+        self.bucket_seconds = bucket_seconds
+        self.buckets = deque()  # [bucket_start, {key: [decisions, completed, successful]}]
+        self.totals = {}
+        self.lock = threading.RLock()
+    
+    def add(self, key: tuple, field: str, ts: float, amount: int = 1):
+        """Add amount to a counter at time ts (ignored if already outside the window)"""
+        with self.lock:
+            self._add(key, field, ts, amount)
+    
+    def _add(self, key: tuple, field: str, ts: float, amount: int):
+        self.expire(time.time())
+        bucket_start = int(ts // self.bucket_seconds) * self.bucket_seconds
+        if bucket_start + self.bucket_seconds <= time.time() - self.span_seconds:
+            return
+        
+        counts = None
+        for start, bucket_counts in reversed(self.buckets):
+            if start == bucket_start:
+                counts = bucket_counts
+                break
+            if start < bucket_start:
+                break
+        if counts is None:
+            if self.buckets and self.buckets[-1][0] > bucket_start:
+                # Out-of-order write for a bucket that was never opened - keep ordering intact
+                index = 0
+                while self.buckets[index][0] < bucket_start:
+                    index += 1
+                self.buckets.insert(index, [bucket_start, {}])
+                counts = self.buckets[index][1]
+            else:
+                self.buckets.append([bucket_start, {}])
+                counts = self.buckets[-1][1]
+        
+        index = self.FIELDS.index(field)
+        counts.setdefault(key, [0, 0, 0])[index] += amount
+        self.totals.setdefault(key, [0, 0, 0])[index] += amount
+    
+    def expire(self, now: float):
+        """Drop buckets older than the window span and subtract them from totals"""
+        cutoff = now - self.span_seconds
+        with self.lock:
+            while self.buckets and self.buckets[0][0] + self.bucket_seconds <= cutoff:
+                _, counts = self.buckets.popleft()
+                for key, values in counts.items():
+                    total = self.totals[key]
+                    for i, value in enumerate(values):
+                        total[i] -= value
+                    if not any(total):
+                        del self.totals[key]
+    
+    def summary(self) -> Dict:
+        """Volume and success rate, overall and per entity_type / severity"""
+        with self.lock:
+            self.expire(time.time())
+            totals = [(key, list(values)) for key, values in self.totals.items()]
+        overall = [0, 0, 0]
+        by_entity_type = {}
+        by_severity = {}
+        for (entity_type, severity), values in totals:
+            for group, name in ((by_entity_type, entity_type), (by_severity, severity)):
+                group_values = group.setdefault(name, [0, 0, 0])
+                for i, value in enumerate(values):
+                    group_values[i] += value
+            for i, value in enumerate(values):
+                overall[i] += value
+        
+        def _format(values):
+            decisions, completed, successful = values
+            return {
+                'decisions': decisions,
+                'completed': completed,
+                'success_rate': round(successful / completed * 100, 2) if completed else 0.0
+            }
+        
+        result = _format(overall)
+        result['by_entity_type'] = {name: _format(v) for name, v in by_entity_type.items()}
+        result['by_severity'] = {name: _format(v) for name, v in by_severity.items()}
+        return result
 
 class AgentMemory:
-    def __init__(self):
+    def __init__(self, autoload: bool = True):
         self.decisions = []
         self.issue_history = {}  # Track issues across cycles
-        self.load()
+        self.live_decisions = {}  # issue_key -> decision_id of the live (coalescing) decision
+        self.decision_index = {}  # decision_id -> decision
+        self.dirty = False
+        # Held while the decide stage mutates memory, so a save on the persist
+        # stage's thread serializes a consistent view
+        self.lock = threading.RLock()
+        self.write_lock = threading.Lock()
+        self._reset_counters()
+        if autoload:
+            self.load()
+    
+    def _reset_counters(self):
+        """Reset running counters used to answer stats reads in O(1)"""
+        self.counters = {'pending': 0, 'completed': 0, 'successful': 0}
+        self.active_issue_count = 0
+        self.windows = {name: RollingWindow(span, bucket) for name, span, bucket in STATS_WINDOWS}
+    
+    def _rebuild_counters(self):
+        """Recompute running counters from loaded decisions and issue history"""
+        self._reset_counters()
+        for decision in sorted(self.decisions, key=lambda d: d.get('timestamp') or ''):
+            self._tally(decision, 1)
+            self._window_add(decision, 'decisions', decision.get('timestamp'))
+        for decision in sorted(self.decisions, key=lambda d: d.get('updated_at') or ''):
+            if _is_completed(decision):
+                self._window_add_outcome(decision, 1)
+        self.active_issue_count = len([i for i in self.issue_history.values() if not i.get('resolved', False)])
+    
+    def _tally(self, decision: Dict, sign: int):
+        """Add (sign=1) or remove (sign=-1) a retained decision from the counters"""
+        if _is_completed(decision):
+            self.counters['completed'] += sign
+            if _is_successful(decision):
+                self.counters['successful'] += sign
+        elif decision.get('outcome') == 'pending':
+            self.counters['pending'] += sign
+    
+    def _window_add(self, decision: Dict, field: str, timestamp: Optional[str], amount: int = 1):
+        # Keyed by peak severity: coalescing can lower 'severity' in place, the peak never changes
+        severity = decision.get('peak_severity', decision.get('severity', 'MEDIUM'))
+        key = (decision.get('entity_type', 'unknown'), str(severity).upper())
+        ts = _to_epoch(timestamp)
+        for window in self.windows.values():
+            window.add(key, field, ts, amount)
+    
+    def _window_add_outcome(self, decision: Dict, sign: int):
+        self._window_add(decision, 'completed', decision.get('updated_at'), sign)
+        if _is_successful(decision):
+            self._window_add(decision, 'successful', decision.get('updated_at'), sign)
     
     def load(self):
-        """Load previous decisions and issue history from disk"""
+        """Load previous decisions and issue history from disk (under the lock, as the API may already be reading)"""
+        data = {}
         if os.path.exists(MEMORY_FILE):
             try:
                 with open(MEMORY_FILE, 'r') as f:
                     data = json.load(f)
-                    self.decisions = data.get('decisions', [])
-                    self.issue_history = data.get('issue_history', {})
             except Exception as e:
                 print(f"Error loading memory: {e}")
-                self.decisions = []
-                self.issue_history = {}
+                data = {}
+        with self.lock:
+            self.decisions = data.get('decisions', [])
+            self.issue_history = data.get('issue_history', {})
+            self.decision_index = {d.get('decision_id'): d for d in self.decisions}
+            self.live_decisions = {key: decision_id for key, decision_id in data.get('live_decisions', {}).items()
+                                   if decision_id in self.decision_index}
+            self._rebuild_counters()
     
     def save(self):
         """Save decisions and issue history to disk"""
         try:
-            with open(MEMORY_FILE, 'w') as f:
-                json.dump({
+            with self.lock:
+                payload = json.dumps({
                     'decisions': self.decisions,
-                    'issue_history': self.issue_history
-                }, f, indent=2)
+                    'issue_history': self.issue_history,
+                    'live_decisions': self.live_decisions
+                }, separators=(',', ':'))
+                self.dirty = False
+            with self.write_lock, open(MEMORY_FILE, 'w') as f:
+                f.write(payload)
         except Exception as e:
+            self.dirty = True
             print(f"Error saving memory: {e}")
     
+    def flush(self):
+        """Save to disk if anything changed since the last save (once per cycle)"""
+        if self.dirty:
+            self.save()
+    
+    def active_issues(self) -> Dict:
+        """Unresolved issues with their live decision IDs (for snapshots)"""
+        with self.lock:
+            return {
+                key: {'issue': dict(issue), 'live_decision': self.live_decisions.get(key)}
+                for key, issue in self.issue_history.items() if not issue.get('resolved', False)
+            }
+    
+    def restore_active_issues(self, active: Dict):
+        """Re-add snapshotted active issues missing from the loaded history"""
+        with self.lock:
+            for key, entry in active.items():
+                if key in self.issue_history:
+                    continue
+                self.issue_history[key] = entry['issue']
+                self.active_issue_count += 1
+                if entry.get('live_decision') in self.decision_index:
+                    self.live_decisions[key] = entry['live_decision']
+    
+    def get_live_decision(self, issue_key: str) -> Optional[Dict]:
+        """Get the live decision currently coalescing updates for an issue"""
+        decision_id = self.live_decisions.get(issue_key)
+        return self.decision_index.get(decision_id) if decision_id else None
+    
     def record_decision(self, decision: Dict):
-        """Record a new decision"""
+        """
+        Record a decision. A decision that is already stored (a coalesced update
+        of a live decision) is updated in place instead of appended.
+        """
+        self.dirty = True
+        if decision.get('decision_id') in self.decision_index:
+            return
+        
         self.decisions.append(decision)
-        # Keep only last 100 decisions
-        if len(self.decisions) > 100:
-            self.decisions = self.decisions[-100:]
-        self.save()
+        self.decision_index[decision.get('decision_id')] = decision
+        if decision.get('issue_key'):
+            self.live_decisions[decision['issue_key']] = decision.get('decision_id')
+        self._tally(decision, 1)
+        self._window_add(decision, 'decisions', decision.get('timestamp'))
+        if _is_completed(decision):
+            self._window_add_outcome(decision, 1)
+        # Keep only last MAX_DECISIONS decisions
+        if len(self.decisions) > MAX_DECISIONS:
+            for evicted in self.decisions[:-MAX_DECISIONS]:
+                self._tally(evicted, -1)
+                self.decision_index.pop(evicted.get('decision_id'), None)
+                if self.live_decisions.get(evicted.get('issue_key')) == evicted.get('decision_id'):
+                    del self.live_decisions[evicted['issue_key']]
+            self.decisions = self.decisions[-MAX_DECISIONS:]
     
     def track_issue(self, issue_key: str, anomaly: Dict) -> Dict:
         """
@@ -71,6 +299,7 @@ class AgentMemory:
                 'severity_history': [anomaly.get('severity', 'MEDIUM')],
                 'resolved': False
             }
+            self.active_issue_count += 1
             status = 'NEW'
         else:
             # Existing issue
@@ -84,12 +313,18 @@ class AgentMemory:
                 issue['severity_history'] = issue['severity_history'][-10:]
             
             # Determine if ongoing or recurring
-            if issue['occurrence_count'] >= 3:
+            if issue.get('resolved', False):
+                # Issue came back after being resolved
+                issue['resolved'] = False
+                issue.pop('resolved_at', None)
+                self.active_issue_count += 1
+                status = 'RECURRING'
+            elif issue['occurrence_count'] >= 3:
                 status = 'ONGOING'
             else:
                 status = 'RECURRING'
         
-        self.save()
+        self.dirty = True
         
         # Calculate duration
         first_detected = datetime.fromisoformat(self.issue_history[issue_key]['first_detected'])
@@ -105,10 +340,27 @@ class AgentMemory:
     def mark_resolved(self, issue_key: str):
         """Mark an issue as resolved"""
         if issue_key in self.issue_history:
+            if not self.issue_history[issue_key].get('resolved', False):
+                self.active_issue_count -= 1
             self.issue_history[issue_key]['resolved'] = True
             self.issue_history[issue_key]['resolved_at'] = datetime.now().isoformat()
+            self.live_decisions.pop(issue_key, None)
             self.save()
     
+    def resolve_idle_issues(self, max_idle_minutes: int = ISSUE_IDLE_MINUTES):
+        """Resolve active issues that have not been seen for max_idle_minutes"""
+        now = datetime.now()
+        for key, issue in self.issue_history.items():
+            if issue.get('resolved', False):
+                continue
+            last_seen = datetime.fromisoformat(issue.get('last_seen', now.isoformat()))
+            if (now - last_seen).total_seconds() / 60 > max_idle_minutes:
+                issue['resolved'] = True
+                issue['resolved_at'] = now.isoformat()
+                self.active_issue_count -= 1
+                self.live_decisions.pop(key, None)
+                self.dirty = True
+    
     def cleanup_old_issues(self, max_age_hours: int = 24):
         """Remove resolved issues older than max_age_hours"""
         now = datetime.now()
@@ -125,44 +377,73 @@ class AgentMemory:
             del self.issue_history[key]
         
         if to_remove:
-            self.save()
+            self.dirty = True
+    
+    def _apply_outcome(self, decision_id: str, outcome: str, reward: float, evaluation: Optional[Dict] = None) -> bool:
+        decision = self.decision_index.get(decision_id)
+        if decision is None:
+            return False
+        self._tally(decision, -1)
+        if _is_completed(decision):
+            self._window_add_outcome(decision, -1)
+        decision['outcome'] = outcome
+        decision['reward'] = reward
+        if evaluation is not None:
+            decision['evaluation'] = evaluation
+        decision['updated_at'] = datetime.now().isoformat()
+        self._tally(decision, 1)
+        if _is_completed(decision):
+            self._window_add_outcome(decision, 1)
+        self.dirty = True
+        return True
     
     def update_outcome(self, decision_id: str, outcome: str, reward: float = 0.0):
         """Update the outcome of a decision"""
-        for decision in self.decisions:
-            if decision.get('decision_id') == decision_id:
-                decision['outcome'] = outcome
-                decision['reward'] = reward
-                decision['updated_at'] = datetime.now().isoformat()
-                break
+        with self.lock:
+            self._apply_outcome(decision_id, outcome, reward)
         self.save()
     
+    def update_outcomes(self, updates: List[Dict]) -> int:
+        """
+        Apply a batch of outcomes (dicts with decision_id, outcome, reward and
+        optional evaluation). Memory is marked dirty and saved by the next flush.
+        
+        Returns:
+            Number of decisions updated
+        """
+        with self.lock:
+            return sum(self._apply_outcome(u['decision_id'], u['outcome'], u['reward'], u.get('evaluation'))
+                       for u in updates)
+    
+    def pending_decisions(self) -> List[Dict]:
+        """Retained decisions still waiting for an outcome"""
+        with self.lock:
+            return [d for d in self.decisions if d.get('outcome') == 'pending']
+    
     def get_decisions(self, limit: int = 10) -> List[Dict]:
         """Get recent decisions"""
         return self.decisions[-limit:]
     
     def get_success_rate(self) -> float:
         """Calculate success rate of past decisions"""
-        if not self.decisions:
-            return 0.0
-        
-        completed = [d for d in self.decisions if d.get('outcome') not in ['pending', None]]
-        if not completed:
+        if not self.counters['completed']:
             return 0.0
-        
-        successful = [d for d in completed if d.get('reward', 0) > 0]
-        return len(successful) / len(completed) * 100
+        return self.counters['successful'] / self.counters['completed'] * 100
+    
+    def get_window_stats(self) -> Dict:
+        """Rolling volume and success rate per window, broken down by entity_type and severity"""
+        with self.lock:
+            return {name: window.summary() for name, window in self.windows.items()}
     
     def get_stats(self) -> Dict:
-        """Get memory statistics"""
-        active_issues = len([i for i in self.issue_history.values() if not i.get('resolved', False)])
-        
-        return {
-            'total_decisions': len(self.decisions),
-            'recent_decisions': len([d for d in self.decisions if d.get('outcome') == 'pending']),
-            'success_rate': round(self.get_success_rate(), 2),
-            'last_decision': self.decisions[-1] if self.decisions else None,
-            'active_issues': active_issues,
-            'total_tracked_issues': len(self.issue_history)
-        }
-
+        """Get memory statistics (safe to call from request threads)"""
+        with self.lock:
+            return {
+                'total_decisions': len(self.decisions),
+                'recent_decisions': self.counters['pending'],
+                'success_rate': round(self.get_success_rate(), 2),
+                'last_decision': self.decisions[-1] if self.decisions else None,
+                'active_issues': self.active_issue_count,
+                'total_tracked_issues': len(self.issue_history),
+                'windows': self.get_window_stats()
+            }
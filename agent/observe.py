@@ -3,11 +3,16 @@ SlayPay AI Agent - Data Observation Module
 Pulls and structures payment events from backend
 """
 
+import math
+import os
+import random
 import requests
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 
-BACKEND_URL = "https://cybercipher.onrender.com"
+from sketch import HyperLogLog, hash_value
+
+BACKEND_URL = os.getenv('BACKEND_URL', "https://cybercipher.onrender.com")
 
 def fetch_recent_events(limit: int = 100) -> List[Dict]:
     """Fetch recent payment events from backend"""
@@ -31,58 +36,261 @@ def fetch_metrics() -> Dict:
         print(f"Error fetching metrics: {e}")
     return {}
 
-def structure_events(events: List[Dict]) -> Dict:
-    """Structure events for easier analysis"""
-    if not events:
+# Aggregates structure_events can build (detectors declare which ones they need)
+AGGREGATES = ('by_status', 'by_bank', 'by_method', 'by_pair', 'recent_failures')
+
+# Load shedding: when aggregating every event would blow the per-cycle budget,
+# structure_events gets a stratified sample (per bank+method) instead
+SHED_BUDGET_MS = 250   # CPU budget per cycle for aggregation
+SHED_MIN_SHARE = 0.25  # never aggregate fewer than this share of the observed events
+SHED_RELEASE = 0.8     # stop sampling once the full load costs under this share of the budget
+STRATUM_FLOOR = 50     # events kept per stratum before proportional allocation
+CONFIDENCE_Z = 1.96    # 95% confidence intervals
+
+def _count(table: Dict, key: str, status: str, weight: Optional[float] = None,
+           amount: float = 0.0, user_hash: Optional[int] = None):
+    """
+    Increment total/failure/success counts for one entity (by its sampling
+    weight, if any), its payment value and, for failures, the value at risk and
+    the sketch of affected users
+    """
+    stats = table.get(key)
+    if stats is None:
+        stats = table[key] = {'total': 0, 'failures': 0, 'successes': 0, 'amount': 0.0, 'value_at_risk': 0.0}
+    count = 1 if weight is None else weight
+    stats['total'] += count
+    stats['amount'] += amount * count
+    if status == 'failure':
+        stats['failures'] += count
+        stats['value_at_risk'] += amount * count
+        if user_hash is not None:
+            users = stats.get('users')
+            if users is None:
+                users = stats['users'] = HyperLogLog()
+            users.add_hash(user_hash)
+    elif status == 'success':
+        stats['successes'] += count
+    if weight is not None:
+        stats['sampled'] = stats.get('sampled', 0) + 1
+        stats['weight_sq'] = stats.get('weight_sq', 0) + weight * weight
+        if status == 'failure':
+            stats['sampled_failures'] = stats.get('sampled_failures', 0) + 1
+
+def wilson_interval(failures: float, n: float, z: float = CONFIDENCE_Z) -> Tuple[float, float]:
+    """Wilson score interval for a failure proportion, as percentages"""
+    if n <= 0:
+        return (0.0, 100.0)
+    p = failures / n
+    centre = p + z * z / (2 * n)
+    margin = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n))
+    denominator = 1 + z * z / n
+    return (round(max(0.0, (centre - margin) / denominator) * 100, 2),
+            round(min(1.0, (centre + margin) / denominator) * 100, 2))
+
+def _finalize(table: Dict, weighted: bool, user_caps: Optional[Dict[str, int]] = None):
+    """
+    Turn user sketches into estimates and, for sampled counts, round them and
+    attach sample sizes and failure-rate intervals. Sampled users are scaled up
+    by the entity's failures per sampled failure, like its value at risk, but
+    never past user_caps (distinct failed users in the whole batch), since a
+    distinct count grows slower than the sample.
+    """
+    for key, stats in table.items():
+        users = stats.pop('users', None)
+        affected = users.count() if users is not None else 0
+        sampled_failures = stats.pop('sampled_failures', 0)
+        if sampled_failures and stats['failures'] > sampled_failures:
+            affected *= stats['failures'] / sampled_failures
+            if user_caps is not None:
+                affected = min(affected, user_caps.get(key, affected))
+        stats['affected_users'] = round(affected)
+        stats['amount'] = round(stats['amount'], 2)
+        stats['value_at_risk'] = round(stats['value_at_risk'], 2)
+        if not weighted:
+            continue
+        total = stats['total']
+        weight_sq = stats.pop('weight_sq', 0)
+        if stats.get('sampled', 0) < round(total) and weight_sq:
+            # Kish effective sample size accounts for unequal weights across strata
+            effective = total * total / weight_sq
+            stats['failure_rate_ci'] = wilson_interval(stats['failures'] / total * effective, effective)
+        else:
+            stats.pop('sampled', None)
+        for field in ('total', 'failures', 'successes'):
+            stats[field] = round(stats[field])
+
+def sample_events(events: List[Dict], target: int, floor: int = STRATUM_FLOOR,
+                  rng: Optional[random.Random] = None) -> Tuple[List[Dict], List[float], int]:
+    """
+    Stratified sample of events, one stratum per bank+method pair.
+    
+    Every stratum keeps up to `floor` events (all of them if it is smaller), so
+    small banks and methods stay above MIN_SAMPLE_SIZE and their outages stay
+    visible; the rest of the target is shared in proportion to stratum size.
+    When the target cannot give every stratum its floor, the floor drops to an
+    equal share of the target (at least one event per stratum).
+    Each kept event carries the weight stratum_size / kept, so weighted counts
+    estimate the full counts.
+    
+    Returns:
+        (sampled events, weights, number of strata)
+    """
+    rng = rng or random
+    strata = {}
+    for event in events:
+        strata.setdefault((event.get('bank', 'unknown'), event.get('method', 'unknown')), []).append(event)
+    
+    floor = max(1, min(floor, target // max(len(strata), 1)))
+    allocation = {key: min(len(members), floor) for key, members in strata.items()}
+    remaining = target - sum(allocation.values())
+    spare = len(events) - sum(allocation.values())
+    if remaining > 0 and spare > 0:
+        for key, members in strata.items():
+            allocation[key] += min(len(members) - allocation[key],
+                                   (len(members) - allocation[key]) * remaining // spare)
+    
+    sample, weights = [], []
+    for key, members in strata.items():
+        kept = allocation[key]
+        sample.extend(members if kept == len(members) else rng.sample(members, kept))
+        weights.extend([len(members) / kept] * kept)
+    return sample, weights, len(strata)
+
+def distinct_failed_users(events: List[Dict]) -> Dict[str, Dict[str, int]]:
+    """
+    Exact distinct users with a failed payment per bank, method and pair over
+    a whole batch (sets over the failures only, no hashing), used to cap the
+    affected_users estimates of a sampled batch.
+    
+    Returns:
+        {'by_bank': {bank: users}, 'by_method': {...}, 'by_pair': {...}}
+    """
+    users = {'by_bank': {}, 'by_method': {}, 'by_pair': {}}
+    for event in events:
+        if event.get('status') != 'failure' or not event.get('user_id'):
+            continue
+        bank = event.get('bank', 'unknown')
+        method = event.get('method', 'unknown')
+        for name, key in (('by_bank', bank), ('by_method', method), ('by_pair', f"{bank}+{method}")):
+            users[name].setdefault(key, set()).add(event['user_id'])
+    return {name: {key: len(ids) for key, ids in table.items()} for name, table in users.items()}
+
+class LoadShedder:
+    """
+    Switches structure_events to stratified sampling when the cycle budget is exceeded.
+    
+    The agent reports how long aggregation (structure_events) took for how
+    many events; sampling and everything after aggregation are not counted,
+    as they do not grow with the events aggregated. From the running cost
+    per event the shedder projects the cost of the full load and, if that
+    exceeds budget_ms, caps the events aggregated per cycle at what fits the
+    budget, but never below min_share of the events observed that cycle.
+    Sampling turns off again once the full load would cost less than
+    SHED_RELEASE of the budget.
+    """
+    
+    def __init__(self, budget_ms: float = SHED_BUDGET_MS, min_share: float = SHED_MIN_SHARE):
+        self.budget_ms = budget_ms
+        self.min_share = min_share
+        self.cost_per_event_ms = None  # exponentially weighted running average
+        self.target = None  # events aggregated per cycle, None = all of them
+        self.shed_cycles = 0
+    
+    def sample_target(self, event_count: int) -> Optional[int]:
+        """Events to aggregate this cycle, or None to aggregate them all"""
+        if self.target is None:
+            return None
+        target = max(self.target, math.ceil(event_count * self.min_share))
+        return None if event_count <= target else target
+    
+    def record(self, observed: int, aggregated: int, elapsed_ms: float):
+        """Update the cost model after a cycle aggregated `aggregated` of `observed` events"""
+        if aggregated <= 0:
+            return
+        cost = elapsed_ms / aggregated
+        self.cost_per_event_ms = cost if self.cost_per_event_ms is None else 0.7 * self.cost_per_event_ms + 0.3 * cost
+        projected_ms = observed * self.cost_per_event_ms
+        if projected_ms > self.budget_ms:
+            self.target = max(1, int(self.budget_ms / self.cost_per_event_ms))
+        elif projected_ms < self.budget_ms * SHED_RELEASE:
+            self.target = None
+        if aggregated < observed:
+            self.shed_cycles += 1
+    
+    def report(self) -> Dict:
         return {
-            'total': 0,
-            'by_status': {},
-            'by_bank': {},
-            'by_method': {},
-            'recent_failures': []
+            'enabled': self.target is not None,
+            'target_events': self.target,
+            'budget_ms': self.budget_ms,
+            'cost_per_event_us': round(self.cost_per_event_ms * 1000, 2) if self.cost_per_event_ms else None,
+            'shed_cycles': self.shed_cycles
         }
+
+def structure_events(events: List[Dict], aggregates=None, weights: Optional[List[float]] = None,
+                     user_caps: Optional[Dict[str, Dict[str, int]]] = None) -> Dict:
+    """
+    Structure events for easier analysis
     
-    structured = {
-        'total': len(events),
-        'by_status': {},
-        'by_bank': {},
-        'by_method': {},
-        'recent_failures': []
-    }
+    Args:
+        events: Raw payment events (final attempts only, see ChainIndex)
+        aggregates: Names from AGGREGATES to build (all of them if None)
+        weights: Per-event sampling weights (from sample_events). Counts are
+            then scaled-up estimates, and entities estimated from a partial
+            sample carry 'sampled' and a 95% 'failure_rate_ci'.
+        user_caps: distinct_failed_users() of the full batch, capping the
+            scaled-up affected_users of a sampled batch
     
-    for event in events:
-        # Count by status
+    Bank, method and pair entries also carry the payment 'amount', the
+    'value_at_risk' (amount of failed payments) and an 'affected_users'
+    estimate (distinct users with a failed payment, from a HyperLogLog sketch).
+    """
+    wanted = set(AGGREGATES if aggregates is None else aggregates)
+    structured = {'total': len(events) if weights is None else round(sum(weights))}
+    for name in AGGREGATES:
+        structured[name] = [] if name == 'recent_failures' else {}
+    
+    by_status = structured['by_status'] if 'by_status' in wanted else None
+    by_bank = structured['by_bank'] if 'by_bank' in wanted else None
+    by_method = structured['by_method'] if 'by_method' in wanted else None
+    by_pair = structured['by_pair'] if 'by_pair' in wanted else None
+    recent_failures = structured['recent_failures'] if 'recent_failures' in wanted else None
+    
+    for i, event in enumerate(events):
+        weight = None if weights is None else weights[i]
         status = event.get('status', 'unknown')
-        structured['by_status'][status] = structured['by_status'].get(status, 0) + 1
-        
-        # Count by bank
         bank = event.get('bank', 'unknown')
-        if bank not in structured['by_bank']:
-            structured['by_bank'][bank] = {'total': 0, 'failures': 0, 'successes': 0}
-        structured['by_bank'][bank]['total'] += 1
-        if status == 'failure':
-            structured['by_bank'][bank]['failures'] += 1
-        elif status == 'success':
-            structured['by_bank'][bank]['successes'] += 1
-        
-        # Count by method
         method = event.get('method', 'unknown')
-        if method not in structured['by_method']:
-            structured['by_method'][method] = {'total': 0, 'failures': 0, 'successes': 0}
-        structured['by_method'][method]['total'] += 1
-        if status == 'failure':
-            structured['by_method'][method]['failures'] += 1
-        elif status == 'success':
-            structured['by_method'][method]['successes'] += 1
+        amount = float(event.get('amount') or 0)
+        user_hash = hash_value(event['user_id']) if status == 'failure' and event.get('user_id') else None
+        
+        # Count by status
+        if by_status is not None:
+            by_status[status] = by_status.get(status, 0) + (1 if weight is None else weight)
+        
+        # Count by bank, method and bank+method pair (same key format as the backend's presets)
+        if by_bank is not None:
+            _count(by_bank, bank, status, weight, amount, user_hash)
+        if by_method is not None:
+            _count(by_method, method, status, weight, amount, user_hash)
+        if by_pair is not None:
+            _count(by_pair, f"{bank}+{method}", status, weight, amount, user_hash)
         
         # Track recent failures
-        if status == 'failure':
-            structured['recent_failures'].append({
+        if recent_failures is not None and status == 'failure':
+            failure = {
                 'transaction_id': event.get('transaction_id'),
                 'bank': bank,
                 'method': method,
                 'error_code': event.get('error_code'),
                 'timestamp': event.get('timestamp')
-            })
+            }
+            if weight is not None and weight != 1:
+                failure['weight'] = weight
+            recent_failures.append(failure)
+    
+    for name in ('by_bank', 'by_method', 'by_pair'):
+        _finalize(structured[name], weights is not None, (user_caps or {}).get(name))
+    if weights is not None:
+        structured['by_status'] = {status: round(count) for status, count in structured['by_status'].items()}
     
     return structured
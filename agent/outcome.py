@@ -0,0 +1,83 @@
+"""
+SlayPay AI Agent - Outcome Module
+Scores past decisions by comparing their entity before and after the decision
+"""
+
+from typing import Dict, List, Optional
+from datetime import datetime
+import time
+
+from reason import FAILURE_RATE_THRESHOLD, MIN_SAMPLE_SIZE
+from timeseries import entity_key
+
+OUTCOME_WINDOW_MINUTES = 10  # length of the before and after windows
+OUTCOME_MIN_CHANGE = 0.1     # |reward| below this is scored 'unchanged'
+FAILURE_WEIGHT = 0.8         # share of the reward from failure rate (the rest from latency)
+
+def _decision_time(decision: Dict) -> Optional[float]:
+    """Epoch seconds of a decision's (local isoformat) timestamp"""
+    try:
+        return datetime.fromisoformat(decision['timestamp']).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def score_outcome(before: Dict, after: Dict) -> Dict:
+    """
+    Turn before/after window totals into an outcome and reward.
+    
+    The reward is the relative drop in failure rate, blended with the relative
+    drop in average latency, clipped to -1..1 (positive = the entity got better).
+    
+    Returns:
+        Dict with outcome ('improved', 'unchanged', 'worsened' or 'inconclusive') and reward
+    """
+    if before['total'] < MIN_SAMPLE_SIZE or after['total'] < MIN_SAMPLE_SIZE:
+        return {'outcome': 'inconclusive', 'reward': 0.0}
+    
+    failure_change = (before['failure_rate'] - after['failure_rate']) / max(before['failure_rate'], FAILURE_RATE_THRESHOLD)
+    latency_change = (before['avg_latency'] - after['avg_latency']) / before['avg_latency'] if before['avg_latency'] else 0.0
+    reward = FAILURE_WEIGHT * failure_change + (1 - FAILURE_WEIGHT) * latency_change
+    reward = round(max(-1.0, min(1.0, reward)), 3)
+    
+    if reward >= OUTCOME_MIN_CHANGE:
+        outcome = 'improved'
+    elif reward <= -OUTCOME_MIN_CHANGE:
+        outcome = 'worsened'
+    else:
+        outcome = 'unchanged'
+    return {'outcome': outcome, 'reward': reward}
+
+def evaluate_outcomes(pending: List[Dict], timeseries, now: Optional[float] = None,
+                      window_minutes: int = OUTCOME_WINDOW_MINUTES) -> List[Dict]:
+    """
+    Score pending decisions whose after-window has fully elapsed.
+    
+    Each decision is compared over the window_minutes before it and the
+    window_minutes after it, read from the time-series store's per-minute
+    aggregates (two window lookups per decision, no event scan). The minute the
+    decision was made is left out of both windows.
+    
+    Args:
+        pending: decisions with outcome 'pending'
+        timeseries: TimeSeriesStore holding the entities' history
+        now: evaluation time in epoch seconds (default now)
+    
+    Returns:
+        Outcome updates for AgentMemory.update_outcomes()
+    """
+    now = time.time() if now is None else now
+    window = window_minutes * 60
+    updates = []
+    for decision in pending:
+        decided_at = _decision_time(decision)
+        if decided_at is None or now < decided_at + window + 60:
+            continue
+        key = entity_key(decision.get('entity_type', 'unknown'), decision.get('entity', 'unknown'))
+        before = timeseries.window_totals(key, decided_at - window, decided_at - 60)
+        after = timeseries.window_totals(key, decided_at + 60, decided_at + window)
+        updates.append({
+            'decision_id': decision['decision_id'],
+            **score_outcome(before, after),
+            'evaluation': {'window_minutes': window_minutes, 'before': before, 'after': after}
+        })
+    return updates
@@ -0,0 +1,116 @@
+"""
+SlayPay AI Agent - Pipeline Module
+Bounded producer/consumer queues so consecutive cycles overlap across stages
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+import queue
+import threading
+import time
+
+PIPELINE_QUEUE_SIZE = 1  # cycles buffered in front of each pipeline stage
+POLL_SECONDS = 0.5       # how often blocked workers re-check for shutdown
+
+class StagePipeline:
+    """
+    Runs each stage on its own worker thread, connected by bounded FIFO queues.
+    
+    The producer submits items to the first stage and every stage hands its
+    result to the next. With a single worker per stage, items are processed in
+    order, so a stage never sees cycle N+1 before it has finished cycle N. A
+    full queue blocks the stage feeding it (backpressure): a slow stage holds
+    back the ones before it instead of letting work pile up, and at most
+    queue_size items wait in front of any stage.
+    """
+    
+    def __init__(self, stages: List[Tuple[str, Callable]], queue_size: int = PIPELINE_QUEUE_SIZE,
+                 on_error: Optional[Callable] = None):
+        self.stages = [name for name, _ in stages]
+        self.queue_size = queue_size
+        self.queues = {name: queue.Queue(maxsize=queue_size) for name in self.stages}
+        self.on_error = on_error  # called as on_error(stage, item, exception)
+        self.stop_event = threading.Event()
+        self.stats = {name: {'processed': 0, 'errors': 0, 'max_depth': 0, 'blocked_ms': 0.0}
+                      for name in self.stages}
+        self.workers = [
+            threading.Thread(target=self._work, args=(name, fn, self.stages[i + 1] if i + 1 < len(stages) else None),
+                             daemon=True, name=f'agent-pipeline-{name}')
+            for i, (name, fn) in enumerate(stages)
+        ]
+    
+    def start(self):
+        for worker in self.workers:
+            if not worker.is_alive():
+                worker.start()
+    
+    def stop(self):
+        """Stop accepting and processing items (in-flight items are dropped)"""
+        self.stop_event.set()
+    
+    def submit(self, item) -> bool:
+        """Feed the first stage, blocking while it is full"""
+        return self._put(self.stages[0], item)
+    
+    def _put(self, stage: str, item) -> bool:
+        """
+        Block until the stage's queue has room.
+        
+        Returns:
+            False if the pipeline was stopped before the item was queued
+        """
+        stage_queue = self.queues[stage]
+        stats = self.stats[stage]
+        started = time.monotonic()
+        while not self.stop_event.is_set():
+            try:
+                stage_queue.put(item, timeout=POLL_SECONDS)
+            except queue.Full:
+                continue
+            stats['blocked_ms'] += (time.monotonic() - started) * 1000
+            stats['max_depth'] = max(stats['max_depth'], stage_queue.qsize())
+            return True
+        return False
+    
+    def _work(self, stage: str, fn: Callable, next_stage: Optional[str]):
+        stage_queue = self.queues[stage]
+        while not self.stop_event.is_set():
+            try:
+                item = stage_queue.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                continue
+            try:
+                result = fn(item)
+            except Exception as e:
+                self.stats[stage]['errors'] += 1
+                if self.on_error:
+                    self.on_error(stage, item, e)
+                result = None
+            else:
+                self.stats[stage]['processed'] += 1
+            
+            # Forward before marking done, so join() never misses an item in hand-off
+            if next_stage is not None and result is not None:
+                self._put(next_stage, result)
+            stage_queue.task_done()
+    
+    def join(self):
+        """Block until every submitted item has passed through all stages"""
+        for stage in self.stages:
+            self.queues[stage].join()
+    
+    def depths(self) -> Dict[str, int]:
+        return {stage: self.queues[stage].qsize() for stage in self.stages}
+    
+    def report(self) -> Dict:
+        """Queue depth and throughput per stage (for workflow_state)"""
+        return {
+            stage: {
+                'depth': self.queues[stage].qsize(),
+                'capacity': self.queue_size,
+                'max_depth': self.stats[stage]['max_depth'],
+                'processed': self.stats[stage]['processed'],
+                'errors': self.stats[stage]['errors'],
+                'blocked_ms': round(self.stats[stage]['blocked_ms'], 1)
+            }
+            for stage in self.stages
+        }
@@ -3,8 +3,9 @@ SlayPay AI Agent - Reasoning Module
 Detects patterns and anomalies in payment data with severity classification
 """
 
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
 from datetime import datetime
+import time
 
 # Thresholds for anomaly detection
 FAILURE_RATE_THRESHOLD = 5.0  # % - alert if failure rate exceeds this
@@ -18,7 +19,8 @@ SEVERITY_THRESHOLDS = {
     'HIGH': {'failure_rate': 30.0, 'affected_min': 50}
 }
 
-def classify_severity(failure_rate: float, sample_size: int, baseline: float = 5.0) -> str:
+def classify_severity(failure_rate: float, sample_size: int, baseline: float = 5.0,
+                      ci: Optional[Tuple[float, float]] = None) -> str:
     """
     Classify severity based on magnitude, duration, and affected transactions
     
@@ -26,10 +28,16 @@ def classify_severity(failure_rate: float, sample_size: int, baseline: float = 5
         failure_rate: Current failure rate percentage
         sample_size: Number of transactions analyzed
         baseline: Baseline failure rate for comparison
+        ci: Confidence interval (low, high) of an estimated failure rate; the
+            rate is then classified at its lower bound so sampling noise
+            cannot escalate severity
     
     Returns:
         'LOW', 'MEDIUM', or 'HIGH'
     """
+    if ci is not None:
+        failure_rate = min(failure_rate, ci[0])
+    
     # Calculate how much worse than baseline
     degradation_factor = failure_rate / baseline if baseline > 0 else failure_rate
     
@@ -53,58 +61,86 @@ def classify_severity(failure_rate: float, sample_size: int, baseline: float = 5
     
     return 'LOW'
 
-def detect_bank_anomalies(structured_data: Dict) -> List[Dict]:
-    """Detect banks with unusual failure rates or latency"""
-    anomalies = []
+# Entity scopes and the aggregate each one iterates
+ENTITY_SCOPES = {
+    'bank': 'by_bank',
+    'method': 'by_method',
+    'pair': 'by_pair'
+}
+GLOBAL_SCOPE = 'global'
+
+class Detector(NamedTuple):
+    """A registered anomaly check"""
+    name: str
+    scope: str        # an ENTITY_SCOPES key, or GLOBAL_SCOPE
+    category: str     # analysis key its findings are listed under
+    needs: Tuple[str, ...]  # structure_events aggregates it reads
+    check: Callable
+
+# Registry of detectors, in registration order
+DETECTORS: Dict[str, Detector] = {}
+
+def register_detector(name: str, scope: str, category: str, needs: Tuple[str, ...] = ()):
+    """
+    Register a detector.
     
-    for bank, stats in structured_data.get('by_bank', {}).items():
-        if stats['total'] < MIN_SAMPLE_SIZE:
-            continue
-        
-        failure_rate = (stats['failures'] / stats['total']) * 100
-        
-        if failure_rate > FAILURE_RATE_THRESHOLD:
-            severity = classify_severity(failure_rate, stats['total'], FAILURE_RATE_THRESHOLD)
-            
-            anomalies.append({
-                'type': 'high_failure_rate',
-                'entity': bank,
-                'entity_type': 'bank',
-                'severity': severity,
-                'value': round(failure_rate, 2),
-                'threshold': FAILURE_RATE_THRESHOLD,
-                'sample_size': stats['total'],
-                'failures_count': stats['failures']
-            })
+    Entity-scoped checks are called as check(entity, stats, structured_data) once
+    per entity in the scope's aggregate and return an anomaly dict or None.
+    Global checks are called as check(structured_data) and return a list.
+    """
+    if scope != GLOBAL_SCOPE and scope not in ENTITY_SCOPES:
+        raise ValueError(f"Unknown detector scope: {scope}")
     
-    return anomalies
+    def decorator(check: Callable) -> Callable:
+        needed = tuple(needs) if scope == GLOBAL_SCOPE else tuple(sorted({ENTITY_SCOPES[scope], *needs}))
+        DETECTORS[name] = Detector(name, scope, category, needed, check)
+        return check
+    return decorator
 
-def detect_method_anomalies(structured_data: Dict) -> List[Dict]:
-    """Detect payment methods with unusual failure rates"""
-    anomalies = []
+def required_aggregates() -> Set[str]:
+    """Union of the aggregates every registered detector needs"""
+    return {aggregate for detector in DETECTORS.values() for aggregate in detector.needs}
+
+def failure_rate_anomaly(entity: str, entity_type: str, stats: Dict) -> Optional[Dict]:
+    """Flag an entity whose failure rate exceeds the threshold"""
+    if stats['total'] < MIN_SAMPLE_SIZE:
+        return None
     
-    for method, stats in structured_data.get('by_method', {}).items():
-        if stats['total'] < MIN_SAMPLE_SIZE:
-            continue
-        
-        failure_rate = (stats['failures'] / stats['total']) * 100
-        
-        if failure_rate > FAILURE_RATE_THRESHOLD:
-            severity = classify_severity(failure_rate, stats['total'], FAILURE_RATE_THRESHOLD)
-            
-            anomalies.append({
-                'type': 'high_failure_rate',
-                'entity': method,
-                'entity_type': 'method',
-                'severity': severity,
-                'value': round(failure_rate, 2),
-                'threshold': FAILURE_RATE_THRESHOLD,
-                'sample_size': stats['total'],
-                'failures_count': stats['failures']
-            })
+    failure_rate = (stats['failures'] / stats['total']) * 100
+    ci = stats.get('failure_rate_ci')
+    # A sampled estimate must clear the threshold with its whole interval
+    if (ci[0] if ci is not None else failure_rate) <= FAILURE_RATE_THRESHOLD:
+        return None
     
-    return anomalies
+    anomaly = {
+        'type': 'high_failure_rate',
+        'entity': entity,
+        'entity_type': entity_type,
+        'severity': classify_severity(failure_rate, stats['total'], FAILURE_RATE_THRESHOLD, ci),
+        'value': round(failure_rate, 2),
+        'threshold': FAILURE_RATE_THRESHOLD,
+        'sample_size': stats['total'],
+        'failures_count': stats['failures'],
+        'value_at_risk': stats.get('value_at_risk', 0.0),
+        'affected_users': stats.get('affected_users', 0)
+    }
+    if ci is not None:
+        # Counts are scaled up from a stratified sample (load shedding)
+        anomaly['sampled'] = stats['sampled']
+        anomaly['failure_rate_ci'] = list(ci)
+    return anomaly
+
+@register_detector('bank_failure_rate', 'bank', 'bank_anomalies')
+def detect_bank_failure_rate(bank: str, stats: Dict, structured_data: Dict) -> Optional[Dict]:
+    """Detect banks with unusual failure rates"""
+    return failure_rate_anomaly(bank, 'bank', stats)
+
+@register_detector('method_failure_rate', 'method', 'method_anomalies')
+def detect_method_failure_rate(method: str, stats: Dict, structured_data: Dict) -> Optional[Dict]:
+    """Detect payment methods with unusual failure rates"""
+    return failure_rate_anomaly(method, 'method', stats)
 
+@register_detector('repeated_error', GLOBAL_SCOPE, 'error_patterns', needs=('recent_failures',))
 def detect_error_patterns(structured_data: Dict) -> List[Dict]:
     """Detect repeating error codes that might indicate systemic issues"""
     patterns = []
@@ -113,34 +149,55 @@ def detect_error_patterns(structured_data: Dict) -> List[Dict]:
     if not recent_failures:
         return patterns
     
-    # Count error codes
+    # Count error codes (sampled failures count for the failures they stand for)
     error_counts = {}
     for failure in recent_failures:
         error_code = failure.get('error_code', 'UNKNOWN')
-        error_counts[error_code] = error_counts.get(error_code, 0) + 1
+        error_counts[error_code] = error_counts.get(error_code, 0) + failure.get('weight', 1)
+    total_failures = round(sum(failure.get('weight', 1) for failure in recent_failures))
     
     # Alert if same error appears too frequently
     for error_code, count in error_counts.items():
-        if count >= 3:  # 3+ occurrences of same error
+        if round(count) >= 3:  # 3+ occurrences of same error
             patterns.append({
                 'type': 'repeated_error',
                 'error_code': error_code,
                 'severity': 'medium',
-                'occurrences': count,
-                'total_failures': len(recent_failures)
+                'occurrences': round(count),
+                'total_failures': total_failures
             })
     
     return patterns
 
 def analyze_all(structured_data: Dict) -> Dict:
-    """Run all anomaly detection algorithms"""
-    bank_anomalies = detect_bank_anomalies(structured_data)
-    method_anomalies = detect_method_anomalies(structured_data)
-    error_patterns = detect_error_patterns(structured_data)
-    
-    return {
-        'bank_anomalies': bank_anomalies,
-        'method_anomalies': method_anomalies,
-        'error_patterns': error_patterns,
-        'total_anomalies': len(bank_anomalies) + len(method_anomalies) + len(error_patterns)
-    }
+    """
+    Run every registered detector.
+    
+    Each entity scope is walked once and all of its detectors are evaluated per
+    entity in the same pass; global detectors run once. Time spent in each
+    detector is reported under 'detector_timings_ms'.
+    """
+    analysis = {detector.category: [] for detector in DETECTORS.values()}
+    timings = dict.fromkeys(DETECTORS, 0.0)
+    
+    for scope, aggregate in ENTITY_SCOPES.items():
+        detectors = [d for d in DETECTORS.values() if d.scope == scope]
+        if not detectors:
+            continue
+        for entity, stats in structured_data.get(aggregate, {}).items():
+            for detector in detectors:
+                started = time.perf_counter()
+                anomaly = detector.check(entity, stats, structured_data)
+                timings[detector.name] += time.perf_counter() - started
+                if anomaly:
+                    analysis[detector.category].append(anomaly)
+    
+    for detector in DETECTORS.values():
+        if detector.scope == GLOBAL_SCOPE:
+            started = time.perf_counter()
+            analysis[detector.category].extend(detector.check(structured_data))
+            timings[detector.name] += time.perf_counter() - started
+    
+    analysis['total_anomalies'] = sum(len(findings) for findings in analysis.values())
+    analysis['detector_timings_ms'] = {name: round(seconds * 1000, 3) for name, seconds in timings.items()}
+    return analysis
@@ -0,0 +1,106 @@
+"""
+SlayPay AI Agent - Routing Table Module
+Immutable, versioned routing weights served to the payment path
+"""
+
+from typing import Dict, Mapping, NamedTuple, Optional
+from types import MappingProxyType
+import json
+
+CIRCUIT_CLOSED = 'closed'        # route normally
+CIRCUIT_HALF_OPEN = 'half_open'  # route a reduced share of traffic
+CIRCUIT_OPEN = 'open'            # route to backups
+
+CIRCUIT_RANK = {CIRCUIT_CLOSED: 0, CIRCUIT_HALF_OPEN: 1, CIRCUIT_OPEN: 2}
+
+class RouteEntry(NamedTuple):
+    """Routing state for one bank, method or bank+method pair"""
+    weight: float
+    circuit: str
+    failure_rate: float
+    sample_size: int
+    severity: Optional[str]
+
+DEFAULT_ROUTE = RouteEntry(1.0, CIRCUIT_CLOSED, 0.0, 0, None)
+
+class RoutingTable:
+    """
+    Read-only routing weights for one compiled version.
+    
+    A table is never mutated after construction; the agent publishes a new
+    table by swapping its reference, so readers on other threads always see a
+    consistent version without locking. Lookups are dict gets.
+    """
+    
+    __slots__ = ('version', 'generated_at', 'banks', 'methods', 'pairs', '_json')
+    
+    def __init__(self, version: int, generated_at: Optional[str],
+                 banks: Mapping[str, RouteEntry], methods: Mapping[str, RouteEntry],
+                 pairs: Mapping[str, RouteEntry]):
+        self.version = version
+        self.generated_at = generated_at
+        self.banks = MappingProxyType(dict(banks))
+        self.methods = MappingProxyType(dict(methods))
+        self.pairs = MappingProxyType(dict(pairs))
+        self._json = json.dumps(self.to_dict())
+    
+    def lookup(self, bank: Optional[str], method: Optional[str]) -> Dict:
+        """
+        Effective route for a transaction.
+        
+        The weight is the minimum across the bank, method and pair entries, and
+        the circuit is the most restrictive of them. Unknown entities route normally.
+        """
+        entries = (
+            self.banks.get(bank, DEFAULT_ROUTE),
+            self.methods.get(method, DEFAULT_ROUTE),
+            self.pairs.get(f"{bank}+{method}", DEFAULT_ROUTE)
+        )
+        circuit = max((entry.circuit for entry in entries), key=CIRCUIT_RANK.__getitem__)
+        return {
+            'version': self.version,
+            'bank': bank,
+            'method': method,
+            'weight': min(entry.weight for entry in entries),
+            'circuit': circuit
+        }
+    
+    def same_routes(self, banks: Mapping[str, RouteEntry], methods: Mapping[str, RouteEntry],
+                    pairs: Mapping[str, RouteEntry]) -> bool:
+        """
+        True if the given entries route exactly like this table: same weight and
+        circuit for every entity, an absent entity counting as DEFAULT_ROUTE.
+        Failure rates and sample sizes are informational and not compared.
+        """
+        for current, proposed in ((self.banks, banks), (self.methods, methods), (self.pairs, pairs)):
+            for key in current.keys() | proposed.keys():
+                old = current.get(key, DEFAULT_ROUTE)
+                new = proposed.get(key, DEFAULT_ROUTE)
+                if (old.weight, old.circuit) != (new.weight, new.circuit):
+                    return False
+        return True
+    
+    def to_dict(self) -> Dict:
+        def _entries(table):
+            return {key: entry._asdict() for key, entry in table.items()}
+        return {
+            'version': self.version,
+            'generated_at': self.generated_at,
+            'banks': _entries(self.banks),
+            'methods': _entries(self.methods),
+            'pairs': _entries(self.pairs)
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'RoutingTable':
+        """Rebuild a table from to_dict() output"""
+        def _entries(table):
+            return {key: RouteEntry(**entry) for key, entry in table.items()}
+        return cls(data['version'], data.get('generated_at'), _entries(data.get('banks', {})),
+                   _entries(data.get('methods', {})), _entries(data.get('pairs', {})))
+    
+    def to_json(self) -> str:
+        """Pre-serialized table (built once per version)"""
+        return self._json
+
+EMPTY_TABLE = RoutingTable(0, None, {}, {}, {})
@@ -0,0 +1,244 @@
+"""
+SlayPay AI Agent - Scheduler Module
+Fixed-rate cycle scheduling with per-stage deadlines and adaptive cadence
+"""
+
+from typing import Callable, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime
+import threading
+import time
+
+# Cadence (seconds between cycle ticks)
+BASE_INTERVAL = 30
+MIN_INTERVAL = 10   # tightened cadence while HIGH-severity issues are active
+MAX_INTERVAL = 60   # relaxed cadence when traffic is quiet
+QUIET_TRAFFIC_EVENTS = 20  # fewer new events per cycle than this (and no anomalies) counts as quiet
+
+# Per-stage deadlines (seconds)
+STAGE_DEADLINES = {
+    'observe': 10.0,
+    'reason': 5.0,
+    'decide': 5.0,
+    'memory': 10.0
+}
+
+# Error backoff
+MAX_BACKOFF = 300  # seconds
+
+HUNG_POLL_SECONDS = 0.5  # how often a stage waiting on its own hung run re-checks
+
+class StageTimeout(Exception):
+    """Raised when a stage does not finish within its deadline"""
+    
+    def __init__(self, stage: str, deadline: float):
+        super().__init__(f"{stage} stage missed its {deadline:g}s deadline")
+        self.stage = stage
+        self.deadline = deadline
+
+class CycleScheduler:
+    """
+    Fixed-rate tick scheduler for the agent loop.
+    
+    Ticks are anchored to the start of the schedule (start + k * interval) so
+    cycle duration does not stretch the period. A cycle that overruns sheds the
+    ticks it missed instead of running them back to back. Stages run on worker
+    threads with a deadline; a stage that hangs is abandoned and later ticks
+    are shed until it returns, so one stuck call cannot pile up work.
+    
+    Cycles may complete on other threads than the one waiting for ticks (see
+    pipeline.StagePipeline): backoff and cadence changes wake the waiting tick.
+    """
+    
+    def __init__(self, base_interval: float = BASE_INTERVAL,
+                 stage_deadlines: Optional[Dict[str, float]] = None,
+                 min_interval: float = MIN_INTERVAL,
+                 max_interval: float = MAX_INTERVAL):
+        self.base_interval = base_interval
+        self.min_interval = min(min_interval, base_interval)
+        self.max_interval = max(max_interval, base_interval)
+        self.interval = base_interval
+        self.stage_deadlines = dict(STAGE_DEADLINES if stage_deadlines is None else stage_deadlines)
+        
+        self.executor = ThreadPoolExecutor(max_workers=len(self.stage_deadlines) + 1,
+                                           thread_name_prefix='agent-stage')
+        self.stop_event = threading.Event()
+        self.condition = threading.Condition()  # guards next_tick/interval, wakes the tick wait
+        self.hung_stages = {}  # stage -> future still running past its deadline
+        
+        self.next_tick = None
+        self.cycle_started = None
+        self.consecutive_errors = 0
+        self.stats = {
+            'cycles': 0,
+            'skipped_ticks': 0,
+            'missed_deadlines': {stage: 0 for stage in self.stage_deadlines},
+            'last_lag_ms': 0.0,
+            'max_lag_ms': 0.0,
+            'last_cycle_ms': 0.0,
+            'stage_durations_ms': {},
+            'cadence_reason': 'base'
+        }
+    
+    def stop(self):
+        """Stop waiting for ticks (in-flight stages are left to finish)"""
+        self.stop_event.set()
+        with self.condition:
+            self.condition.notify_all()
+        self.executor.shutdown(wait=False)
+    
+    def wait_for_next_tick(self) -> bool:
+        """
+        Sleep until the next scheduled tick.
+        
+        Returns:
+            False if the scheduler was stopped, True when a cycle should run
+        """
+        with self.condition:
+            now = time.monotonic()
+            if self.next_tick is None:
+                self.next_tick = now
+            
+            if now > self.next_tick + self.interval:
+                # Overran one or more whole ticks - shed them instead of catching up
+                missed = int((now - self.next_tick) // self.interval)
+                self.stats['skipped_ticks'] += missed
+                self.next_tick += missed * self.interval
+            
+            # Re-check after every wake-up: backoff or a cadence change may move the tick
+            while not self.stop_event.is_set():
+                delay = self.next_tick - time.monotonic()
+                if delay <= 0:
+                    break
+                self.condition.wait(delay)
+            if self.stop_event.is_set():
+                return False
+            
+            started = time.monotonic()
+            lag_ms = max(0.0, (started - self.next_tick) * 1000)
+            self.stats['last_lag_ms'] = round(lag_ms, 1)
+            self.stats['max_lag_ms'] = round(max(self.stats['max_lag_ms'], lag_ms), 1)
+            self.cycle_started = started
+            self.next_tick += self.interval
+            return True
+    
+    def should_shed(self) -> Optional[str]:
+        """Return the name of a stage still hung from an earlier tick, if any"""
+        for stage, future in list(self.hung_stages.items()):
+            if future.done():
+                del self.hung_stages[stage]
+            else:
+                return stage
+        return None
+    
+    def shed_tick(self):
+        """Record a tick that was skipped because an earlier stage is still hung"""
+        self.stats['skipped_ticks'] += 1
+    
+    def run_stage(self, stage: str, fn: Callable, *args):
+        """
+        Run a stage on a worker thread and wait at most its deadline.
+        
+        If an earlier run of the same stage was abandoned and is still going,
+        this first waits for it, so runs of one stage never overlap.
+        
+        Raises:
+            StageTimeout: if the stage has not finished by its deadline
+        """
+        hung = self.hung_stages.get(stage)
+        while hung is not None and not hung.done() and not self.stop_event.wait(HUNG_POLL_SECONDS):
+            pass
+        
+        deadline = self.stage_deadlines.get(stage)
+        started = time.monotonic()
+        future = self.executor.submit(fn, *args)
+        try:
+            return future.result(timeout=deadline)
+        except FutureTimeout:
+            self.hung_stages[stage] = future
+            self.stats['missed_deadlines'][stage] = self.stats['missed_deadlines'].get(stage, 0) + 1
+            raise StageTimeout(stage, deadline)
+        finally:
+            self.stats['stage_durations_ms'][stage] = round((time.monotonic() - started) * 1000, 1)
+    
+    def complete_cycle(self, started: Optional[float] = None):
+        """Record a successful cycle (started: its tick time, if not the latest tick)"""
+        started = self.cycle_started if started is None else started
+        self.consecutive_errors = 0
+        self.stats['cycles'] += 1
+        if started is not None:
+            self.stats['last_cycle_ms'] = round((time.monotonic() - started) * 1000, 1)
+    
+    def record_error(self, started: Optional[float] = None) -> float:
+        """
+        Record a failed cycle and push the next tick back with exponential backoff.
+        
+        Returns:
+            Backoff delay in seconds
+        """
+        started = self.cycle_started if started is None else started
+        with self.condition:
+            self.consecutive_errors += 1
+            if started is not None:
+                self.stats['last_cycle_ms'] = round((time.monotonic() - started) * 1000, 1)
+            backoff = min(self.interval * (2 ** (self.consecutive_errors - 1)), MAX_BACKOFF)
+            self.next_tick = time.monotonic() + backoff
+            self.condition.notify_all()
+        return backoff
+    
+    def adapt(self, high_severity_active: bool, event_count: int, anomaly_count: int):
+        """
+        Tighten cadence while HIGH issues are active, relax it when traffic is quiet
+        
+        Args:
+            event_count: events first seen this cycle (the fetch window always
+                returns the latest events, however old, so its size says
+                nothing about current traffic)
+        """
+        if high_severity_active:
+            interval, reason = self.min_interval, 'high_severity_active'
+        elif event_count < QUIET_TRAFFIC_EVENTS and anomaly_count == 0:
+            interval, reason = self.max_interval, 'quiet_traffic'
+        else:
+            interval, reason = self.base_interval, 'base'
+        
+        with self.condition:
+            if interval != self.interval and self.next_tick is not None:
+                # Re-anchor the next tick to the new period from the latest tick
+                anchor = self.cycle_started if self.cycle_started is not None else time.monotonic()
+                self.next_tick = anchor + interval
+                self.condition.notify_all()
+            self.interval = interval
+            self.stats['cadence_reason'] = reason
+    
+    def report(self) -> Dict:
+        """Scheduler entry for workflow_state"""
+        missed = sum(self.stats['missed_deadlines'].values())
+        hung = [stage for stage, future in self.hung_stages.items() if not future.done()]
+        status = 'warning' if hung or self.consecutive_errors else 'running'
+        
+        summary = (f"Every {self.interval:g}s ({self.stats['cadence_reason'].replace('_', ' ')}), "
+                   f"lag {self.stats['last_lag_ms']:.0f}ms, {missed} missed deadlines, "
+                   f"{self.stats['skipped_ticks']} skipped ticks")
+        if hung:
+            summary += f" - waiting on hung stage: {', '.join(hung)}"
+        
+        return {
+            'status': status,
+            'summary': summary,
+            'last_updated': datetime.now().isoformat(),
+            'details': {
+                'interval_seconds': self.interval,
+                'cadence_reason': self.stats['cadence_reason'],
+                'cycles': self.stats['cycles'],
+                'last_cycle_ms': self.stats['last_cycle_ms'],
+                'last_lag_ms': self.stats['last_lag_ms'],
+                'max_lag_ms': self.stats['max_lag_ms'],
+                'skipped_ticks': self.stats['skipped_ticks'],
+                'missed_deadlines': dict(self.stats['missed_deadlines']),
+                'stage_deadlines_seconds': dict(self.stage_deadlines),
+                'stage_durations_ms': dict(self.stats['stage_durations_ms']),
+                'hung_stages': hung,
+                'consecutive_errors': self.consecutive_errors
+            }
+        }
@@ -0,0 +1,54 @@
+"""
+SlayPay AI Agent - Sketch Module
+Fixed-size probabilistic counters for per-entity aggregates
+"""
+
+from hashlib import blake2b
+import math
+
+HLL_PRECISION = 10  # 2^10 one-byte registers per sketch, ~3.3% standard error
+
+def hash_value(value) -> int:
+    """64-bit hash of a value (hash once, add_hash() to several sketches)"""
+    return int.from_bytes(blake2b(str(value).encode(), digest_size=8).digest(), 'big')
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct counter.
+    
+    Memory is 2^precision bytes however many values are added. Each value is
+    hashed to 64 bits; the first `precision` bits pick a register and the
+    register keeps the longest run of leading zeros seen in the rest. Sketches
+    with the same precision can be merged.
+    """
+    
+    __slots__ = ('precision', 'registers')
+    
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+    
+    def add(self, value):
+        self.add_hash(hash_value(value))
+    
+    def add_hash(self, h: int):
+        bits = 64 - self.precision
+        index = h >> bits
+        rank = bits - (h & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+    
+    def merge(self, other: 'HyperLogLog'):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches with different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+    
+    def count(self) -> int:
+        """Estimated number of distinct values added"""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # linear counting for small cardinalities
+        return int(round(estimate))
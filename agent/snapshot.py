@@ -0,0 +1,89 @@
+"""
+SlayPay AI Agent - Snapshot Module
+Compact binary snapshots of runtime state for warm restarts
+
+A snapshot is JSON metadata plus raw byte blobs (the event store's array
+columns), never pickle, so loading a snapshot cannot run code.
+"""
+
+from typing import Dict, List, Optional
+import json
+import os
+import struct
+import time
+import zlib
+
+SNAPSHOT_FILE = "agent_snapshot.bin"
+SNAPSHOT_MAGIC = b'SLAYSNAP'
+SNAPSHOT_FORMAT = 2
+SNAPSHOT_EVERY_CYCLES = 10  # ~5 minutes at the base cadence
+SNAPSHOT_MAX_AGE_HOURS = 6  # older snapshots are ignored on restart
+
+HEADER = struct.Struct('>8sHd')  # magic, format version, saved_at (epoch seconds)
+LENGTH = struct.Struct('>I')     # JSON metadata length, then the blobs
+BLOB_KEY = '$bytes'              # {BLOB_KEY: [offset, length]} stands for a blob
+
+def _encode(value, blobs: List[bytes], offset: List[int]):
+    """Replace bytes values with blob references (lists of [offset, length])"""
+    if isinstance(value, (bytes, bytearray)):
+        reference = {BLOB_KEY: [offset[0], len(value)]}
+        blobs.append(bytes(value))
+        offset[0] += len(value)
+        return reference
+    if isinstance(value, dict):
+        return {key: _encode(item, blobs, offset) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(item, blobs, offset) for item in value]
+    return value
+
+def save_snapshot(state: Dict, path: str = SNAPSHOT_FILE) -> int:
+    """
+    Write a snapshot atomically (temp file + rename).
+    
+    Returns:
+        Size of the snapshot in bytes
+    """
+    blobs = []
+    metadata = json.dumps(_encode(state, blobs, [0]), separators=(',', ':'), default=str).encode()
+    payload = zlib.compress(LENGTH.pack(len(metadata)) + metadata + b''.join(blobs), 1)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT, time.time()))
+        f.write(payload)
+    os.replace(tmp_path, path)
+    return HEADER.size + len(payload)
+
+def load_snapshot(path: str = SNAPSHOT_FILE, max_age_hours: float = SNAPSHOT_MAX_AGE_HOURS) -> Optional[Dict]:
+    """
+    Load a snapshot written by save_snapshot.
+    
+    Returns:
+        The saved state with 'saved_at' added, or None if the file is missing,
+        stale, from another format version or unreadable
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            magic, version, saved_at = HEADER.unpack(f.read(HEADER.size))
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_FORMAT:
+                print(f"Ignoring snapshot {path}: unknown format")
+                return None
+            if time.time() - saved_at > max_age_hours * 3600:
+                print(f"Ignoring snapshot {path}: older than {max_age_hours}h")
+                return None
+            body = zlib.decompress(f.read())
+        size, = LENGTH.unpack_from(body)
+        blobs = memoryview(body)[LENGTH.size + size:]
+        
+        def _blob(obj):
+            if obj.keys() == {BLOB_KEY}:
+                offset, length = obj[BLOB_KEY]
+                return bytes(blobs[offset:offset + length])
+            return obj
+        state = json.loads(body[LENGTH.size:LENGTH.size + size], object_hook=_blob)
+    except Exception as e:
+        print(f"Error loading snapshot: {e}")
+        return None
+    state['saved_at'] = saved_at
+    return state
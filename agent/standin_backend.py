@@ -0,0 +1,336 @@
+"""
+SlayPay AI Agent - Stand-in Backend
+Offline replacement for the backend's /payments/recent and /metrics/summary
+
+Generates events continuously at a fixed rate using the same presets as
+backend/server.js, played back as a scenario (a sequence of presets).
+
+Usage:
+    python standin_backend.py --scenario incident --rate 20 --phase-seconds 60
+    BACKEND_URL=http://localhost:3001 python main.py
+"""
+
+from typing import Dict, List, Optional
+from collections import deque
+from datetime import datetime, timezone
+import argparse
+import random
+import threading
+import time
+from flask import Flask, jsonify, request
+
+MAX_EVENTS = 1000  # same window as the backend
+DEFAULT_RATE = 20  # events per second
+DEFAULT_PHASE_SECONDS = 60
+TICK_SECONDS = 0.1
+
+BANKS = ['HDFC', 'ICICI', 'SBI', 'Axis', 'Kotak', 'Yes']
+METHODS = ['UPI', 'Card', 'Netbanking', 'Wallet']
+ERROR_CODES = ['BANK_TIMEOUT', 'INSUFFICIENT_FUNDS', 'INVALID_CARD', 'NETWORK_ERROR', 'RATE_LIMIT', 'GATEWAY_ERROR']
+
+# Mirrors FAILURE_PRESETS in backend/server.js
+FAILURE_PRESETS = {
+    'NORMAL': {
+        'target_distribution': {'failure': 0.03, 'retried': 0.03, 'cancelled': 0.01, 'bounced': 0.01},
+        'bank_method_pairs': {
+            'HDFC+UPI': {'failure_rate': 0.08, 'latency_multiplier': 1.2},
+            'SBI+Netbanking': {'failure_rate': 0.05, 'latency_multiplier': 1.5}
+        },
+        'burst_probability': 0.02,
+        'retry_chain_rate': 0.03
+    },
+    'DEGRADED': {
+        'target_distribution': {'failure': 0.18, 'retried': 0.12, 'cancelled': 0.07, 'bounced': 0.03},
+        'bank_method_pairs': {
+            'HDFC+UPI': {'failure_rate': 0.42, 'latency_multiplier': 2.5},
+            'SBI+Netbanking': {'failure_rate': 0.35, 'latency_multiplier': 3.0},
+            'ICICI+Card': {'failure_rate': 0.25, 'latency_multiplier': 1.8},
+            'Axis+UPI': {'failure_rate': 0.30, 'latency_multiplier': 2.2}
+        },
+        'burst_probability': 0.15,
+        'retry_chain_rate': 0.12
+    },
+    'OUTAGE_SIMULATION': {
+        'target_distribution': {'failure': 0.40, 'retried': 0.15, 'cancelled': 0.07, 'bounced': 0.03},
+        'bank_method_pairs': {
+            'HDFC+UPI': {'failure_rate': 0.75, 'latency_multiplier': 4.0},
+            'HDFC+Card': {'failure_rate': 0.65, 'latency_multiplier': 3.5},
+            'SBI+Netbanking': {'failure_rate': 0.70, 'latency_multiplier': 4.5},
+            'SBI+UPI': {'failure_rate': 0.68, 'latency_multiplier': 3.8},
+            'ICICI+Card': {'failure_rate': 0.55, 'latency_multiplier': 2.5},
+            'Axis+UPI': {'failure_rate': 0.60, 'latency_multiplier': 3.2}
+        },
+        'burst_probability': 0.35,
+        'retry_chain_rate': 0.20
+    }
+}
+
+# Presets played in order, each for phase_seconds (the last one runs indefinitely)
+SCENARIOS = {
+    'normal': ['NORMAL'],
+    'degraded': ['DEGRADED'],
+    'outage': ['OUTAGE_SIMULATION'],
+    'incident': ['NORMAL', 'OUTAGE_SIMULATION'],
+    'recovery': ['OUTAGE_SIMULATION', 'NORMAL'],
+    'flapping': ['NORMAL', 'DEGRADED', 'NORMAL', 'DEGRADED']
+}
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+class EventGenerator:
+    """Background generator of payment events for one scenario"""
+    
+    def __init__(self, scenario: str = 'incident', rate: float = DEFAULT_RATE,
+                 phase_seconds: float = DEFAULT_PHASE_SECONDS, seed: Optional[int] = None):
+        if scenario not in SCENARIOS:
+            raise ValueError(f"Unknown scenario: {scenario} (choose from {', '.join(SCENARIOS)})")
+        self.scenario = scenario
+        self.phases = SCENARIOS[scenario]
+        self.rate = rate
+        self.phase_seconds = phase_seconds
+        self.random = random.Random(seed)
+        
+        self.events = deque(maxlen=MAX_EVENTS)  # newest first, like the backend
+        self.retry_candidates = deque(maxlen=50)  # recent non-success transaction IDs
+        self.metrics = {
+            'total': 0, 'success': 0, 'failure': 0, 'latency': 0,
+            'by_bank': {}, 'by_method': {}, 'error_codes': {}
+        }
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.started_at = None
+        self.thread = None
+    
+    def phase_at(self, ts: float) -> int:
+        """Index of the phase active at wall-clock time ts"""
+        if self.started_at is None:
+            return 0
+        return min(int(max(0.0, ts - self.started_at) // self.phase_seconds), len(self.phases) - 1)
+    
+    def incidents(self) -> List[Dict]:
+        """
+        Phase changes that degrade bank+method pairs, with their onset times.
+        
+        Each lists the pairs whose failure rate went up and the banks/methods
+        involved, so a harness can measure how long detection takes.
+        """
+        incidents = []
+        for index in range(1, len(self.phases)):
+            before = FAILURE_PRESETS[self.phases[index - 1]]['bank_method_pairs']
+            after = FAILURE_PRESETS[self.phases[index]]['bank_method_pairs']
+            pairs = [pair for pair, config in after.items()
+                     if config['failure_rate'] > before.get(pair, {}).get('failure_rate', 0.0)]
+            if not pairs:
+                continue
+            incidents.append({
+                'phase': index,
+                'preset': self.phases[index],
+                'onset': self.started_at + index * self.phase_seconds if self.started_at else None,
+                'pairs': pairs,
+                'banks': sorted({pair.split('+')[0] for pair in pairs}),
+                'methods': sorted({pair.split('+')[1] for pair in pairs})
+            })
+        return incidents
+    
+    def generate_event(self, preset: Dict, ts: float, in_burst: bool = False) -> Dict:
+        """One event, following the biased branch of generateRandomEvent in server.js"""
+        rng = self.random
+        bank = rng.choice(BANKS)
+        method = rng.choice(METHODS)
+        status = 'success'
+        latency = rng.randint(100, 399)
+        error_code = None
+        
+        retry_chain_id = None
+        if self.retry_candidates and rng.random() < preset['retry_chain_rate']:
+            retry_chain_id = rng.choice(self.retry_candidates)
+        
+        pair_config = preset['bank_method_pairs'].get(f"{bank}+{method}")
+        if pair_config:
+            latency = int(rng.random() * 300 * pair_config['latency_multiplier']) + 100
+            failure_boost = 0.15 if latency > 800 else 0.0  # latency spikes often precede failures
+            if rng.random() < pair_config['failure_rate'] + failure_boost:
+                roll = rng.random()
+                status = 'failure' if roll < 0.45 else 'retried' if roll < 0.70 else 'cancelled' if roll < 0.85 else 'bounced'
+                latency = rng.randint(500, 1999)
+        elif in_burst:
+            if rng.random() < 0.35:
+                status = 'failure' if rng.random() < 0.7 else 'cancelled'
+                latency = rng.randint(800, 2799)
+        else:
+            roll = rng.random()
+            threshold = 0.0
+            for candidate in ('failure', 'retried', 'cancelled', 'bounced'):
+                threshold += preset['target_distribution'][candidate]
+                if roll < threshold:
+                    status = candidate
+                    break
+            if status != 'success':
+                latency = rng.randint(400, 1599)
+        
+        if retry_chain_id and rng.random() < 0.6:
+            status = 'retried'
+            latency = rng.randint(300, 899)
+        
+        if status in ('failure', 'bounced'):
+            # Correlated error codes - certain banks tend to have specific errors
+            if bank == 'HDFC' and rng.random() < 0.5:
+                error_code = 'BANK_TIMEOUT'
+            elif bank == 'SBI' and rng.random() < 0.4:
+                error_code = 'NETWORK_ERROR'
+            else:
+                error_code = rng.choice(ERROR_CODES)
+        
+        transaction_id = retry_chain_id or f"TXN_{int(ts * 1000)}_{rng.randint(0, 9999)}"
+        if status != 'success' and retry_chain_id is None:
+            self.retry_candidates.append(transaction_id)
+        
+        return {
+            'transaction_id': transaction_id,
+            'timestamp': _iso(ts),
+            'user_id': f"user_{rng.randint(0, 999)}@slaypay.com",
+            'amount': rng.randint(10, 49999),
+            'bank': bank,
+            'method': method,
+            'status': status,
+            'latency': latency,
+            'error_code': error_code
+        }
+    
+    def _add(self, event: Dict):
+        self.events.appendleft(event)
+        metrics = self.metrics
+        metrics['total'] += 1
+        if event['status'] in ('success', 'failure'):
+            metrics[event['status']] += 1
+        metrics['latency'] += event['latency']
+        for table, key in ((metrics['by_bank'], event['bank']), (metrics['by_method'], event['method'])):
+            stats = table.setdefault(key, {'total': 0, 'success': 0, 'failure': 0, 'latency': 0})
+            stats['total'] += 1
+            if event['status'] in ('success', 'failure'):
+                stats[event['status']] += 1
+            stats['latency'] += event['latency']
+        if event['error_code']:
+            metrics['error_codes'][event['error_code']] = metrics['error_codes'].get(event['error_code'], 0) + 1
+    
+    def _run(self):
+        owed = 0.0
+        in_burst = False
+        last_second = None
+        while not self.stop_event.wait(TICK_SECONDS):
+            now = time.time()
+            preset = FAILURE_PRESETS[self.phases[self.phase_at(now)]]
+            if int(now) != last_second:
+                # Bursts are decided once per second
+                last_second = int(now)
+                in_burst = self.random.random() < preset['burst_probability']
+            owed += self.rate * TICK_SECONDS
+            count, owed = int(owed), owed - int(owed)
+            with self.lock:
+                for _ in range(count):
+                    self._add(self.generate_event(preset, now, in_burst))
+    
+    def start(self):
+        self.started_at = time.time()
+        self.thread = threading.Thread(target=self._run, daemon=True, name='standin-generator')
+        self.thread.start()
+    
+    def stop(self):
+        self.stop_event.set()
+    
+    def recent(self, limit: int) -> List[Dict]:
+        with self.lock:
+            return [self.events[i] for i in range(min(limit, len(self.events)))]
+    
+    def summary(self) -> Dict:
+        """Same shape as the backend's /metrics/summary payload"""
+        def _rate(part, total):
+            return f"{part / total * 100:.2f}" if total else "0"
+        
+        def _entity(name, key, stats):
+            return {
+                key: name,
+                'total': stats['total'],
+                'successRate': _rate(stats['success'], stats['total']),
+                'failureRate': _rate(stats['failure'], stats['total']),
+                'avgLatency': round(stats['latency'] / stats['total'])
+            }
+        
+        with self.lock:
+            metrics = self.metrics
+            total = metrics['total']
+            return {
+                'totalTransactions': total,
+                'successCount': metrics['success'],
+                'failureCount': metrics['failure'],
+                'successRate': f"{_rate(metrics['success'], total)}%",
+                'failureRate': f"{_rate(metrics['failure'], total)}%",
+                'avgLatency': f"{round(metrics['latency'] / total) if total else 0}ms",
+                'byBank': [_entity(bank, 'bank', stats) for bank, stats in metrics['by_bank'].items()],
+                'byMethod': [_entity(method, 'method', stats) for method, stats in metrics['by_method'].items()],
+                'topErrors': [{'code': code, 'count': count} for code, count in
+                              sorted(metrics['error_codes'].items(), key=lambda item: -item[1])[:5]]
+            }
+    
+    def status(self) -> Dict:
+        now = time.time()
+        phase = self.phase_at(now)
+        return {
+            'scenario': self.scenario,
+            'phase': phase,
+            'preset': self.phases[phase],
+            'elapsed_seconds': round(now - self.started_at, 1) if self.started_at else 0.0,
+            'rate': self.rate,
+            'total_events': self.metrics['total'],
+            'incidents': self.incidents()
+        }
+
+def create_app(generator: EventGenerator) -> Flask:
+    """Flask app serving the generator with the backend's response shapes"""
+    app = Flask('standin_backend')
+    
+    @app.route('/health', methods=['GET'])
+    def health():
+        return jsonify({'status': 'ok', 'timestamp': datetime.now(timezone.utc).isoformat()})
+    
+    @app.route('/payments/recent', methods=['GET'])
+    def recent_payments():
+        try:
+            limit = min(int(request.args.get('limit', 50)), MAX_EVENTS)
+        except ValueError:
+            limit = 50
+        return jsonify({
+            'success': True,
+            'count': len(generator.events),
+            'events': generator.recent(limit)
+        })
+    
+    @app.route('/metrics/summary', methods=['GET'])
+    def metrics_summary():
+        return jsonify({'success': True, 'metrics': generator.summary()})
+    
+    @app.route('/standin/status', methods=['GET'])
+    def standin_status():
+        return jsonify({'success': True, 'status': generator.status()})
+    
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline stand-in for the SlayPay backend")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=3001)
+    parser.add_argument('--scenario', default='incident', choices=sorted(SCENARIOS))
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE, help="events per second")
+    parser.add_argument('--phase-seconds', type=float, default=DEFAULT_PHASE_SECONDS)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    
+    generator = EventGenerator(args.scenario, rate=args.rate, phase_seconds=args.phase_seconds, seed=args.seed)
+    generator.start()
+    print(f"Stand-in backend: {args.scenario} ({' -> '.join(generator.phases)}, "
+          f"{args.phase_seconds:g}s phases) at {args.rate:g} events/s on http://{args.host}:{args.port}")
+    create_app(generator).run(host=args.host, port=args.port, debug=False, threaded=True)
+
+if __name__ == '__main__':
+    main()
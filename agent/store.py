@@ -0,0 +1,351 @@
+"""
+SlayPay AI Agent - Event Store Module
+Bounded in-memory window of observed events with indexed drill-down queries
+"""
+
+from typing import Dict, List, Optional
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timezone
+import threading
+import time
+
+EVENT_STORE_CAPACITY = 50000  # events kept in the ring buffer
+CHAIN_CAPACITY = 20000        # transaction chains tracked by ChainIndex
+CHAIN_TTL_SECONDS = 1800      # chains not touched for this long are forgotten
+DIMENSIONS = ('bank', 'method', 'status', 'error_code')
+ATTEMPT_FIELDS = ('timestamp', 'bank', 'method', 'status', 'latency', 'error_code')  # kept per chain
+QUERY_LIMIT = 100
+MAX_QUERY_LIMIT = 1000
+
+def parse_event_time(value) -> float:
+    """Event timestamp (ISO string or epoch seconds) to epoch seconds, 0.0 if invalid"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not value:
+        return 0.0
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return 0.0
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+def parse_time_arg(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """
+    Parse a query time bound: ISO timestamp, epoch seconds, or a relative
+    duration back from now such as '30s', '5m', '2h', '1d'.
+    """
+    if not value:
+        return None
+    now = time.time() if now is None else now
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    if value[-1] in units and value[:-1].replace('.', '', 1).isdigit():
+        return now - float(value[:-1]) * units[value[-1]]
+    try:
+        return float(value)
+    except ValueError:
+        parsed = parse_event_time(value)
+        if not parsed:
+            raise ValueError(f"Invalid time: {value}")
+        return parsed
+
+class Interner:
+    """Maps dimension values to small integer codes (0 is reserved for missing)"""
+    
+    def __init__(self):
+        self.codes = {None: 0}
+        self.values = [None]
+    
+    def code(self, value) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+class EventStore:
+    """
+    Fixed-capacity ring buffer of events in array-backed columns.
+    
+    Dimension values are interned to integer codes. Each dimension keeps an
+    inverted index of code -> ring slots, maintained as slots are overwritten,
+    so filters only touch matching slots. Re-fetched events are recognised by
+    (transaction_id, timestamp, status) and stored once.
+    """
+    
+    def __init__(self, capacity: int = EVENT_STORE_CAPACITY):
+        self.capacity = capacity
+        self.interners = {dim: Interner() for dim in DIMENSIONS}
+        self.columns = {dim: array('I', bytes(4 * capacity)) for dim in DIMENSIONS}
+        self.timestamps = array('d', bytes(8 * capacity))
+        self.latencies = array('f', bytes(4 * capacity))
+        self.amounts = array('d', bytes(8 * capacity))
+        self.transaction_ids = [None] * capacity
+        self.keys = [None] * capacity
+        self.seen = {}  # dedupe key -> slot
+        self.indexes = {dim: {} for dim in DIMENSIONS}  # dim -> code -> set(slots)
+        self.head = 0
+        self.size = 0
+        self.total_ingested = 0
+        self.lock = threading.Lock()
+    
+    def _evict(self, slot: int):
+        self.seen.pop(self.keys[slot], None)
+        for dim in DIMENSIONS:
+            slots = self.indexes[dim].get(self.columns[dim][slot])
+            if slots is not None:
+                slots.discard(slot)
+    
+    def ingest(self, events: List[Dict]) -> List[Dict]:
+        """
+        Store events not seen before.
+        
+        Returns:
+            The newly stored events (in input order)
+        """
+        new_events = []
+        with self.lock:
+            for event in events:
+                key = (event.get('transaction_id'), event.get('timestamp'), event.get('status'))
+                if key in self.seen:
+                    continue
+                
+                slot = self.head
+                if self.size == self.capacity:
+                    self._evict(slot)
+                else:
+                    self.size += 1
+                self.head = (self.head + 1) % self.capacity
+                
+                for dim in DIMENSIONS:
+                    code = self.interners[dim].code(event.get(dim))
+                    self.columns[dim][slot] = code
+                    self.indexes[dim].setdefault(code, set()).add(slot)
+                self.timestamps[slot] = parse_event_time(event.get('timestamp'))
+                self.latencies[slot] = float(event.get('latency') or 0)
+                self.amounts[slot] = float(event.get('amount') or 0)
+                self.transaction_ids[slot] = event.get('transaction_id')
+                self.keys[slot] = key
+                self.seen[key] = slot
+                self.total_ingested += 1
+                new_events.append(event)
+        return new_events
+    
+    def _row(self, slot: int) -> Dict:
+        row = {dim: self.interners[dim].values[self.columns[dim][slot]] for dim in DIMENSIONS}
+        row['transaction_id'] = self.transaction_ids[slot]
+        row['timestamp'] = datetime.fromtimestamp(self.timestamps[slot], tz=timezone.utc).isoformat().replace('+00:00', 'Z')
+        row['latency'] = round(self.latencies[slot], 1)
+        row['amount'] = self.amounts[slot]
+        return row
+    
+    def query(self, filters: Optional[Dict[str, str]] = None, since: Optional[float] = None,
+              until: Optional[float] = None, limit: int = QUERY_LIMIT) -> Dict:
+        """
+        Filter stored events by dimension values and time range.
+        
+        Dimension filters go through the inverted indexes; the time range is
+        checked per candidate slot. The ring is kept in arrival order, not time
+        order, so a query with only a time range scans every stored slot
+        (bounded by EVENT_STORE_CAPACITY).
+        
+        Returns:
+            Dict with total match count and the newest `limit` matching events
+        """
+        filters = {dim: value for dim, value in (filters or {}).items() if dim in DIMENSIONS and value is not None}
+        with self.lock:
+            candidate_sets = []
+            for dim, value in filters.items():
+                code = self.interners[dim].codes.get(value)
+                slots = self.indexes[dim].get(code) if code is not None else None
+                if not slots:
+                    return {'count': 0, 'events': []}
+                candidate_sets.append(slots)
+            
+            if candidate_sets:
+                candidate_sets.sort(key=len)
+                candidates = candidate_sets[0].intersection(*candidate_sets[1:])
+            else:
+                candidates = range(self.size)
+            
+            timestamps = self.timestamps
+            matches = [slot for slot in candidates
+                       if (since is None or timestamps[slot] >= since)
+                       and (until is None or timestamps[slot] <= until)]
+            matches.sort(key=timestamps.__getitem__, reverse=True)
+            return {
+                'count': len(matches),
+                'events': [self._row(slot) for slot in matches[:limit]]
+            }
+    
+    def to_snapshot(self) -> Dict:
+        """Compact state for warm restarts (columns as raw bytes, indexes rebuilt on restore)"""
+        with self.lock:
+            return {
+                'capacity': self.capacity,
+                'head': self.head,
+                'size': self.size,
+                'total_ingested': self.total_ingested,
+                'interned': {dim: list(self.interners[dim].values) for dim in DIMENSIONS},
+                'columns': {dim: self.columns[dim].tobytes() for dim in DIMENSIONS},
+                'timestamps': self.timestamps.tobytes(),
+                'latencies': self.latencies.tobytes(),
+                'amounts': self.amounts.tobytes(),
+                'transaction_ids': list(self.transaction_ids),
+                'keys': list(self.keys)
+            }
+    
+    def restore(self, snapshot: Dict) -> bool:
+        """Restore from to_snapshot() output (only into an empty store of the same capacity)"""
+        if snapshot.get('capacity') != self.capacity:
+            return False
+        with self.lock:
+            if self.size:
+                return False
+            for dim in DIMENSIONS:
+                interner = self.interners[dim]
+                interner.values = list(snapshot['interned'][dim])
+                interner.codes = {value: code for code, value in enumerate(interner.values)}
+                self.columns[dim] = array('I', snapshot['columns'][dim])
+            self.timestamps = array('d', snapshot['timestamps'])
+            self.latencies = array('f', snapshot['latencies'])
+            self.amounts = array('d', snapshot['amounts'])
+            self.transaction_ids = list(snapshot['transaction_ids'])
+            self.keys = [tuple(key) if key is not None else None for key in snapshot['keys']]
+            self.head = snapshot['head']
+            self.size = snapshot['size']
+            self.total_ingested = snapshot['total_ingested']
+            
+            self.seen = {}
+            self.indexes = {dim: {} for dim in DIMENSIONS}
+            for slot in range(self.size):
+                self.seen[self.keys[slot]] = slot
+                for dim in DIMENSIONS:
+                    self.indexes[dim].setdefault(self.columns[dim][slot], set()).add(slot)
+        return True
+    
+    def stats(self) -> Dict:
+        return {
+            'stored_events': self.size,
+            'capacity': self.capacity,
+            'total_ingested': self.total_ingested,
+            'distinct_values': {dim: len(self.interners[dim].values) - 1 for dim in DIMENSIONS}
+        }
+
+class ChainIndex:
+    """
+    Bounded LRU/TTL index of transaction retry chains.
+    
+    The backend reuses transaction_id across retries, so one payment can show
+    up as several attempts. Each chain records its attempt count and latest
+    attempt (timestamp and status); final_attempts() then keeps only the
+    latest attempt of every transaction, so aggregates count final outcomes
+    rather than attempts. At most `capacity` chains are kept, least recently
+    updated first out, and chains idle for `ttl` seconds are dropped.
+    
+    The latest attempt's ATTEMPT_FIELDS are kept too, so ingest() can hand
+    back attempts that a later retry superseded.
+    """
+    
+    def __init__(self, capacity: int = CHAIN_CAPACITY, ttl: float = CHAIN_TTL_SECONDS):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.chains = OrderedDict()  # transaction_id -> [attempts, latest timestamp, latest status, touched, latest attempt]
+        self.retried_chains = 0  # chains seen with more than one attempt
+        self.evicted = 0
+        self.lock = threading.Lock()
+    
+    def _expire(self, now: float):
+        while self.chains:
+            chain = next(iter(self.chains.values()))
+            if len(self.chains) <= self.capacity and chain[3] > now - self.ttl:
+                break
+            self.chains.popitem(last=False)
+            self.evicted += 1
+    
+    def ingest(self, events: List[Dict]) -> List[Dict]:
+        """
+        Record newly observed attempts (each attempt must only be ingested once).
+        
+        Returns:
+            Attempts from earlier calls that an attempt in `events` superseded
+        """
+        now = time.time()
+        superseded = []
+        renewed = set()  # chains whose latest attempt is now from this call
+        with self.lock:
+            for event in events:
+                transaction_id = event.get('transaction_id')
+                if not transaction_id:
+                    continue
+                ts = parse_event_time(event.get('timestamp'))
+                chain = self.chains.get(transaction_id)
+                if chain is None:
+                    chain = self.chains[transaction_id] = [0, ts, event.get('status'), now, None]
+                else:
+                    self.chains.move_to_end(transaction_id)
+                    if chain[0] == 1:
+                        self.retried_chains += 1
+                chain[0] += 1
+                if ts >= chain[1]:
+                    if chain[4] is not None and transaction_id not in renewed:
+                        superseded.append(dict(zip(ATTEMPT_FIELDS, chain[4])))
+                    chain[1] = ts
+                    chain[2] = event.get('status')
+                    chain[4] = tuple(event.get(field) for field in ATTEMPT_FIELDS)
+                    renewed.add(transaction_id)
+                chain[3] = now
+            self._expire(now)
+        return superseded
+    
+    def final_attempts(self, events: List[Dict]) -> List[Dict]:
+        """
+        The latest attempt of each transaction in `events` (input order kept).
+        
+        Attempts superseded by a later retry are dropped; transactions the
+        index no longer tracks keep their latest attempt within `events`.
+        """
+        latest = {}
+        with self.lock:
+            for i, event in enumerate(events):
+                transaction_id = event.get('transaction_id')
+                if not transaction_id:
+                    continue
+                chain = self.chains.get(transaction_id)
+                ts = parse_event_time(event.get('timestamp'))
+                if chain is not None and (ts, event.get('status')) != (chain[1], chain[2]):
+                    continue
+                kept = latest.get(transaction_id)
+                if kept is None or ts > parse_event_time(events[kept].get('timestamp')):
+                    latest[transaction_id] = i
+        kept_slots = set(latest.values())
+        return [event for i, event in enumerate(events)
+                if i in kept_slots or not event.get('transaction_id')]
+    
+    def attempts(self, transaction_id: str) -> int:
+        chain = self.chains.get(transaction_id)
+        return chain[0] if chain else 0
+    
+    def to_snapshot(self) -> Dict:
+        with self.lock:
+            return {'chains': [(key, *chain) for key, chain in self.chains.items()],
+                    'retried_chains': self.retried_chains}
+    
+    def restore(self, snapshot: Dict):
+        with self.lock:
+            for key, attempts, ts, status, touched, *attempt in snapshot['chains']:
+                latest = tuple(attempt[0]) if attempt and attempt[0] is not None else None
+                self.chains.setdefault(key, [attempts, ts, status, touched, latest])
+            self.retried_chains = max(self.retried_chains, snapshot.get('retried_chains', 0))
+            self._expire(time.time())
+    
+    def stats(self) -> Dict:
+        return {
+            'tracked_chains': len(self.chains),
+            'capacity': self.capacity,
+            'retried_chains': self.retried_chains,
+            'evicted': self.evicted
+        }
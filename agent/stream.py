@@ -0,0 +1,128 @@
+"""
+SlayPay AI Agent - Change Stream Module
+Versions agent state changes so clients can fetch deltas or stream them
+"""
+
+from typing import Dict, List, Optional, Tuple
+from collections import deque
+import json
+import threading
+
+MAX_CHANGES = 2000  # change log entries kept for ?since= deltas
+HEARTBEAT_SECONDS = 15
+
+class ChangeFeed:
+    """
+    Monotonically versioned log of state changes.
+    
+    Every change to a (kind, key) pair - a workflow stage, a decision - gets the
+    next version number. Publishing a payload equal to the last one for the same
+    key is a no-op, so the version only moves when state actually changes.
+    Clients ask for everything after the version they last saw.
+    """
+    
+    def __init__(self, max_changes: int = MAX_CHANGES):
+        self.version = 0
+        self.changes = deque(maxlen=max_changes)  # (version, kind, key, payload)
+        self.latest = {}  # (kind, key) -> payload
+        self.condition = threading.Condition()
+    
+    def publish(self, kind: str, key: str, payload: Optional[Dict]) -> int:
+        """
+        Record a change. payload=None marks the key as removed.
+        
+        Returns:
+            Current version after the (possibly skipped) publish
+        """
+        with self.condition:
+            if (kind, key) in self.latest:
+                if self.latest[(kind, key)] == payload:
+                    return self.version
+            elif payload is None:
+                return self.version
+            self.version += 1
+            if payload is None:
+                self.latest.pop((kind, key), None)
+            else:
+                self.latest[(kind, key)] = payload
+            self.changes.append((self.version, kind, key, payload))
+            self.condition.notify_all()
+            return self.version
+    
+    def update(self, kind: str, key: str, payload: Dict) -> int:
+        """Publish a new payload only if the key is still present (never revives a removed key)"""
+        with self.condition:
+            if (kind, key) not in self.latest:
+                return self.version
+            return self.publish(kind, key, payload)
+    
+    def restore(self, version: int):
+        """Continue numbering from a restored version (before anything is published)"""
+        with self.condition:
+            self.version = max(self.version, version)
+    
+    def keys(self, kind: str) -> List[str]:
+        """Keys currently present for a kind"""
+        with self.condition:
+            return [key for (k, key) in self.latest if k == kind]
+    
+    def since(self, version: int, kind: Optional[str] = None) -> Tuple[int, Optional[List[Tuple]]]:
+        """
+        Changes after version, collapsed to the newest change per key.
+        
+        Returns:
+            (current version, changes) - changes is None when version is older
+            than the retained log (or newer than the feed, after a restart) and
+            the client has to refetch full state
+        """
+        with self.condition:
+            current = self.version
+            if version > current:
+                # Version from before a restart - client has to resync
+                return current, None
+            if version == current:
+                return current, []
+            oldest = self.changes[0][0] if self.changes else current + 1
+            if version < oldest - 1:
+                return current, None
+            collapsed = {}
+            for change in self.changes:
+                if change[0] > version and (kind is None or change[1] == kind):
+                    collapsed[(change[1], change[2])] = change
+            return current, sorted(collapsed.values(), key=lambda c: c[0])
+    
+    def wait(self, version: int, timeout: float = HEARTBEAT_SECONDS) -> Tuple[int, Optional[List[Tuple]]]:
+        """Block until there are changes after version (or timeout), then return them"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.version > version, timeout=timeout)
+        return self.since(version)
+
+def parse_since(value: Optional[str]) -> Optional[int]:
+    """Parse a ?since= / Last-Event-ID value (None if absent or invalid)"""
+    try:
+        return int(value) if value not in (None, '') else None
+    except ValueError:
+        return None
+
+def format_sse(version: int, kind: str, key: str, payload: Optional[Dict]) -> str:
+    """Format one change as a server-sent event"""
+    data = json.dumps({'version': version, 'key': key, 'removed': payload is None, 'data': payload})
+    return f"id: {version}\nevent: {kind}\ndata: {data}\n\n"
+
+def sse_events(feed: ChangeFeed, since: Optional[int]):
+    """Generator of server-sent events for a client that has seen `since`"""
+    version = feed.version if since is None else since
+    yield f"retry: 3000\nid: {version}\nevent: hello\ndata: {json.dumps({'version': feed.version})}\n\n"
+    while True:
+        current, changes = feed.wait(version)
+        if changes is None:
+            # Client fell too far behind the change log - tell it to resync
+            yield f"id: {current}\nevent: resync\ndata: {json.dumps({'version': current})}\n\n"
+            version = current
+            continue
+        if not changes:
+            yield ": heartbeat\n\n"
+            continue
+        for change in changes:
+            yield format_sse(*change)
+        version = current
@@ -0,0 +1,386 @@
+"""
+SlayPay AI Agent - Time-Series Module
+Memory-mapped per-minute aggregates per bank, method and bank+method pair
+"""
+
+from typing import Dict, Iterable, List, Optional
+from datetime import datetime, timezone
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from store import parse_event_time
+
+TIMESERIES_FILE = "agent_timeseries.dat"   # records, one per (entity, minute slot)
+TIMESERIES_INDEX = "agent_timeseries.idx"  # epoch minute held by each slot
+TIMESERIES_META = "agent_timeseries.json"  # entity and error code slot assignments
+TIMESERIES_FORMAT = 1
+
+RETENTION_DAYS = 30
+MAX_ENTITIES = 64     # banks + methods + pairs
+LATENCY_BUCKETS = 12  # log2 buckets with upper bounds 32ms .. 64s
+ERROR_SLOTS = 8       # distinct error codes tracked; the last slot collects the rest
+COUNT_MAX = np.iinfo(np.uint16).max
+
+RECORD = np.dtype([
+    ('total', '<u4'),
+    ('failures', '<u4'),
+    ('latency_sum', '<f4'),
+    ('latency_hist', '<u2', (LATENCY_BUCKETS,)),
+    ('errors', '<u2', (ERROR_SLOTS,))
+])
+
+LATENCY_BOUNDS = [2 ** (i + 5) for i in range(LATENCY_BUCKETS)]  # bucket upper bounds (ms)
+HOURS_PER_WEEK = 168
+
+def entity_key(entity_type: str, name: str) -> str:
+    """Series key, e.g. entity_key('bank', 'HDFC') -> 'bank:HDFC'"""
+    return f"{entity_type}:{name}"
+
+def latency_bucket(latency: float) -> int:
+    return max(0, min(LATENCY_BUCKETS - 1, (max(int(latency), 1) - 1).bit_length() - 5))
+
+def latency_quantile(hist: np.ndarray, q: float) -> Optional[int]:
+    """Upper bound (ms) of the histogram bucket holding the q-quantile"""
+    count = int(hist.sum())
+    if not count:
+        return None
+    return LATENCY_BOUNDS[int(np.searchsorted(np.cumsum(hist), q * count))]
+
+def hour_of_week(minutes: np.ndarray) -> np.ndarray:
+    """Hour of the week (0 = Monday 00:00 UTC) for epoch minutes"""
+    return ((minutes // 1440 + 3) % 7) * 24 + (minutes // 60) % 24  # 1970-01-01 was a Thursday
+
+def _minute_iso(minute: int) -> str:
+    return datetime.fromtimestamp(minute * 60, tz=timezone.utc).isoformat().replace('+00:00', 'Z')
+
+class TimeSeriesStore:
+    """
+    Fixed-width per-minute records in a preallocated, memory-mapped ring.
+    
+    Records are laid out entity-major (entity, minute slot), so one entity's
+    history is a strided view of the file and baselines are array reductions
+    without copying or parsing. A minute's slot is reused once the retention
+    period has passed: the slot index file records which minute each slot
+    holds, and a slot is zeroed when a newer minute claims it.
+    """
+    
+    def __init__(self, path: str = TIMESERIES_FILE, index_path: str = TIMESERIES_INDEX,
+                 meta_path: str = TIMESERIES_META, retention_days: int = RETENTION_DAYS,
+                 max_entities: int = MAX_ENTITIES):
+        self.path = path
+        self.index_path = index_path
+        self.meta_path = meta_path
+        self.retention = retention_days * 1440
+        self.max_entities = max_entities
+        self.records = None  # memmap (max_entities, retention) of RECORD, set by open()
+        self.minutes = None  # memmap (retention,) of epoch minutes, -1 for never used
+        self.entities = {}   # series key -> row
+        self.error_codes = {}  # error code -> slot
+        self.dropped_events = 0
+        self.lock = threading.Lock()
+    
+    def _layout(self) -> Dict:
+        return {'format': TIMESERIES_FORMAT, 'retention': self.retention, 'max_entities': self.max_entities,
+                'record_size': RECORD.itemsize}
+    
+    def open(self):
+        """Map existing files, or preallocate new ones if missing or laid out differently"""
+        meta = None
+        if os.path.exists(self.meta_path):
+            try:
+                with open(self.meta_path) as f:
+                    meta = json.load(f)
+            except Exception as e:
+                print(f"Error loading time-series metadata: {e}")
+        
+        shape = (self.max_entities, self.retention)
+        reuse = (meta is not None and meta.get('layout') == self._layout()
+                 and os.path.exists(self.path) and os.path.exists(self.index_path))
+        with self.lock:
+            if reuse:
+                self.records = np.memmap(self.path, dtype=RECORD, mode='r+', shape=shape)
+                self.minutes = np.memmap(self.index_path, dtype='<i8', mode='r+', shape=(self.retention,))
+                self.entities = meta.get('entities', {})
+                self.error_codes = meta.get('error_codes', {})
+            else:
+                if meta is not None:
+                    print("Time-series layout changed - starting a new store")
+                self.records = np.memmap(self.path, dtype=RECORD, mode='w+', shape=shape)
+                self.minutes = np.memmap(self.index_path, dtype='<i8', mode='w+', shape=(self.retention,))
+                self.minutes[:] = -1
+                self.entities = {}
+                self.error_codes = {}
+                self._save_meta()
+    
+    def _save_meta(self):
+        with open(self.meta_path, 'w') as f:
+            json.dump({'layout': self._layout(), 'entities': self.entities, 'error_codes': self.error_codes}, f)
+    
+    def _row(self, key: str) -> Optional[int]:
+        row = self.entities.get(key)
+        if row is None and len(self.entities) < self.max_entities:
+            row = self.entities[key] = len(self.entities)
+        return row
+    
+    def _error_slot(self, code: str) -> int:
+        slot = self.error_codes.get(code)
+        if slot is None:
+            slot = len(self.error_codes) if len(self.error_codes) < ERROR_SLOTS - 1 else ERROR_SLOTS - 1
+            if slot < ERROR_SLOTS - 1:
+                self.error_codes[code] = slot
+        return slot
+    
+    def _claim(self, minute: int) -> Optional[int]:
+        """Slot for a minute, zeroing it if it held an older minute (None if too old to keep)"""
+        slot = minute % self.retention
+        held = int(self.minutes[slot])
+        if held == minute:
+            return slot
+        if held > minute:
+            return None
+        self.records[:, slot] = np.zeros(1, dtype=RECORD)
+        self.minutes[slot] = minute
+        return slot
+    
+    def ingest(self, events: Iterable[Dict]) -> int:
+        """
+        Add newly observed events (each event must only be ingested once).
+        
+        Returns:
+            Number of events recorded
+        """
+        return self._accumulate(events, 1)
+    
+    def retract(self, events: Iterable[Dict]) -> int:
+        """
+        Remove previously ingested events (attempts superseded by a later retry),
+        so the series count final outcomes like the aggregates decisions are made on.
+        
+        Returns:
+            Number of events removed
+        """
+        return self._accumulate(events, -1)
+    
+    def _accumulate(self, events: Iterable[Dict], sign: int) -> int:
+        if self.records is None:
+            return 0
+        
+        # Accumulate per (row, minute) first so each record is written once
+        pending = {}
+        minute_events = {}
+        entity_count = len(self.entities)
+        error_count = len(self.error_codes)
+        horizon = int(time.time() // 60) - self.retention
+        with self.lock:
+            for event in events:
+                ts = parse_event_time(event.get('timestamp'))
+                if not ts or ts // 60 <= horizon:
+                    self.dropped_events += sign > 0
+                    continue
+                minute = int(ts // 60)
+                minute_events[minute] = minute_events.get(minute, 0) + 1
+                bank = event.get('bank', 'unknown')
+                method = event.get('method', 'unknown')
+                failed = event.get('status') == 'failure'
+                latency = float(event.get('latency') or 0)
+                error_slot = None
+                if event.get('error_code'):
+                    error_slot = (self._error_slot(event['error_code']) if sign > 0
+                                  else self.error_codes.get(event['error_code'], ERROR_SLOTS - 1))
+                
+                for key in (entity_key('bank', bank), entity_key('method', method), entity_key('pair', f"{bank}+{method}")):
+                    row = self._row(key) if sign > 0 else self.entities.get(key)
+                    if row is None:
+                        continue
+                    acc = pending.get((row, minute))
+                    if acc is None:
+                        acc = pending[(row, minute)] = {
+                            'total': 0, 'failures': 0, 'latency_sum': 0.0,
+                            'latency_hist': np.zeros(LATENCY_BUCKETS, dtype=np.uint32),
+                            'errors': np.zeros(ERROR_SLOTS, dtype=np.uint32)
+                        }
+                    acc['total'] += 1
+                    acc['failures'] += failed
+                    acc['latency_sum'] += latency
+                    acc['latency_hist'][latency_bucket(latency)] += 1
+                    if error_slot is not None:
+                        acc['errors'][error_slot] += 1
+            
+            recorded_minutes = set()
+            for (row, minute), acc in pending.items():
+                if sign > 0:
+                    slot = self._claim(minute)
+                else:
+                    slot = minute % self.retention
+                    if int(self.minutes[slot]) != minute:
+                        slot = None
+                if slot is None:
+                    continue
+                record = self.records[row, slot]
+                if sign > 0:
+                    record['total'] += acc['total']
+                    record['failures'] += acc['failures']
+                    record['latency_sum'] += acc['latency_sum']
+                    # Histogram and error counts are 16-bit: saturate rather than wrap
+                    record['latency_hist'] = np.minimum(record['latency_hist'] + acc['latency_hist'], COUNT_MAX)
+                    record['errors'] = np.minimum(record['errors'] + acc['errors'], COUNT_MAX)
+                else:
+                    record['total'] -= min(int(record['total']), acc['total'])
+                    record['failures'] -= min(int(record['failures']), acc['failures'])
+                    record['latency_sum'] = max(0.0, float(record['latency_sum']) - acc['latency_sum'])
+                    record['latency_hist'] -= np.minimum(record['latency_hist'], acc['latency_hist'])
+                    record['errors'] -= np.minimum(record['errors'], acc['errors'])
+                self.records[row, slot] = record
+                recorded_minutes.add(minute)
+            
+            if sign > 0:
+                self.dropped_events += sum(count for minute, count in minute_events.items() if minute not in recorded_minutes)
+            if len(self.entities) != entity_count or len(self.error_codes) != error_count:
+                self._save_meta()
+        
+        return sum(minute_events[minute] for minute in recorded_minutes)
+    
+    def flush(self):
+        """Write dirty pages back to disk (once per cycle)"""
+        if self.records is not None:
+            self.records.flush()
+            self.minutes.flush()
+    
+    def _window(self, start_minute: int, end_minute: int):
+        """Slots and a validity mask for minutes start..end (inclusive)"""
+        start_minute = max(start_minute, end_minute - self.retention + 1)
+        wanted = np.arange(start_minute, end_minute + 1, dtype=np.int64)
+        slots = wanted % self.retention
+        return wanted, slots, self.minutes[slots] == wanted
+    
+    def series(self, key: str, minutes: int = 60, until: Optional[float] = None) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Per-minute arrays for one entity over the last `minutes` minutes,
+        oldest first (minutes with no data are zero).
+        """
+        row = self.entities.get(key)
+        if row is None or self.records is None:
+            return None
+        end_minute = int((time.time() if until is None else until) // 60)
+        with self.lock:
+            wanted, slots, valid = self._window(end_minute - minutes + 1, end_minute)
+            data = self.records[row, slots]
+        data = np.where(valid, data, np.zeros(1, dtype=RECORD))
+        return {'minute': wanted, **{name: data[name] for name in RECORD.names}}
+    
+    def window_totals(self, key: str, start: float, end: float) -> Dict:
+        """
+        Total, failure and latency figures for one entity between two epoch
+        times (minute resolution).
+        
+        An "error:<code>" key counts events carrying that error code as the
+        failures out of all events, summed across banks.
+        """
+        minutes = max(1, int(end // 60) - int(start // 60) + 1)
+        if key.startswith('error:'):
+            with self.lock:  # ingest adds entities and error codes from the observe thread
+                slot = self.error_codes.get(key[len('error:'):])
+                banks = [name for name in self.entities if name.startswith('bank:')] if slot is not None else []
+            series = [data for data in (self.series(name, minutes=minutes, until=end) for name in banks) if data]
+            total = sum(int(data['total'].sum()) for data in series)
+            failures = sum(int(data['errors'][:, slot].sum()) for data in series)
+            latency_sum = sum(float(data['latency_sum'].sum()) for data in series)
+        else:
+            data = self.series(key, minutes=minutes, until=end)
+            if data is None:
+                return {'total': 0, 'failures': 0, 'failure_rate': None, 'avg_latency': None}
+            total = int(data['total'].sum())
+            failures = int(data['failures'].sum())
+            latency_sum = float(data['latency_sum'].sum())
+        return {'total': total, 'failures': failures,
+                'failure_rate': round(failures / total * 100, 2) if total else None,
+                'avg_latency': round(latency_sum / total, 1) if total else None}
+    
+    def baseline(self, key: str, days: int = RETENTION_DAYS) -> Dict:
+        """Failure rate and mean latency for one entity over the last `days` days"""
+        row = self.entities.get(key)
+        if row is None or self.records is None:
+            return {'days': days, 'total': 0, 'failure_rate': None, 'avg_latency': None}
+        since = int(time.time() // 60) - days * 1440
+        with self.lock:
+            valid = self.minutes >= since
+            history = self.records[row]  # strided view of this entity's ring, no copy
+            total = int(history['total'][valid].sum())
+            failures = int(history['failures'][valid].sum())
+            latency_sum = float(history['latency_sum'][valid].sum())
+        return {
+            'days': days,
+            'total': total,
+            'failure_rate': round(failures / total * 100, 2) if total else None,
+            'avg_latency': round(latency_sum / total, 1) if total else None
+        }
+    
+    def seasonal_baseline(self, key: str, at: Optional[float] = None) -> Dict:
+        """
+        Failure rate for one entity in the same hour of the week as `at`
+        (default now), across all retained weeks.
+        """
+        row = self.entities.get(key)
+        at = time.time() if at is None else at
+        how = int(hour_of_week(np.array([int(at // 60)]))[0])
+        if row is None or self.records is None:
+            return {'hour_of_week': how, 'total': 0, 'failure_rate': None}
+        with self.lock:
+            valid = self.minutes >= 0
+            hours = hour_of_week(self.minutes[valid])
+            totals = np.bincount(hours, weights=self.records[row]['total'][valid], minlength=HOURS_PER_WEEK)
+            failures = np.bincount(hours, weights=self.records[row]['failures'][valid], minlength=HOURS_PER_WEEK)
+        total = int(totals[how])
+        return {
+            'hour_of_week': how,
+            'total': total,
+            'failure_rate': round(float(failures[how]) / total * 100, 2) if total else None
+        }
+    
+    def trend(self, key: str, minutes: int = 60, step: int = 1) -> List[Dict]:
+        """Trend points for charts, one per `step` minutes, oldest first"""
+        step = max(1, step)
+        minutes = max(step, minutes - minutes % step)
+        data = self.series(key, minutes=minutes)
+        if data is None:
+            return []
+        
+        def _bucket(values):
+            return values.reshape(-1, step, *values.shape[1:]).sum(axis=1)
+        
+        totals = _bucket(data['total'].astype(np.int64))
+        failures = _bucket(data['failures'].astype(np.int64))
+        latency_sums = _bucket(data['latency_sum'].astype(np.float64))
+        hists = _bucket(data['latency_hist'].astype(np.int64))
+        errors = _bucket(data['errors'].astype(np.int64))
+        codes = {slot: code for code, slot in self.error_codes.items()}
+        
+        points = []
+        for i, total in enumerate(totals.tolist()):
+            points.append({
+                'timestamp': _minute_iso(int(data['minute'][i * step])),
+                'total': total,
+                'failures': int(failures[i]),
+                'failure_rate': round(int(failures[i]) / total * 100, 2) if total else None,
+                'avg_latency': round(float(latency_sums[i]) / total, 1) if total else None,
+                'latency_p50': latency_quantile(hists[i], 0.5),
+                'latency_p95': latency_quantile(hists[i], 0.95),
+                'errors': {codes.get(slot, 'OTHER'): int(count) for slot, count in enumerate(errors[i]) if count}
+            })
+        return points
+    
+    def stats(self) -> Dict:
+        used = int((self.minutes >= 0).sum()) if self.minutes is not None else 0
+        return {
+            'entities': len(self.entities),
+            'max_entities': self.max_entities,
+            'retention_minutes': self.retention,
+            'minutes_recorded': used,
+            'record_bytes': RECORD.itemsize,
+            'file_bytes': RECORD.itemsize * self.max_entities * self.retention,
+            'dropped_events': self.dropped_events
+        }
@@ -0,0 +1,324 @@
+"""
+SlayPay AI Agent - Threshold Tuning Module
+Offline sweep of detection thresholds and severity tables over historical windows
+
+Evaluates a whole grid of FAILURE_RATE_THRESHOLD / MIN_SAMPLE_SIZE /
+SEVERITY_THRESHOLDS configurations in one vectorized pass, reporting alert
+counts, detection delay and flapping per configuration, plus the severity
+behaviour the severity table controls: delay to HIGH, false HIGH alerts and
+escalations (each of which becomes a new decision).
+
+Usage:
+    python tune.py --windows windows.jsonl
+    python tune.py --events events.json --window-seconds 60 --top 20 --out sweep.csv
+"""
+
+from typing import Dict, List, Optional
+from datetime import datetime
+import argparse
+import csv
+import itertools
+import json
+import time
+
+import numpy as np
+
+from reason import FAILURE_RATE_THRESHOLD, MIN_SAMPLE_SIZE, SEVERITY_THRESHOLDS
+
+# Default sweep grid. There is no LOW axis: classify_severity falls back to
+# LOW for any alert below MEDIUM, so its LOW thresholds never change a result.
+DEFAULT_GRID = {
+    'failure_rate_threshold': [3.0, 4.0, 5.0, 6.0, 8.0, 10.0],
+    'min_sample_size': [5, 10, 15, 20, 30],
+    'medium_failure_rate': [10.0, 15.0, 20.0],
+    'high_failure_rate': [25.0, 30.0, 40.0],
+    'medium_affected_min': [20, 30, 50],
+    'high_affected_min': [30, 50, 80]
+}
+
+# Ground truth when windows carry no 'incident' labels:
+# a window is an incident if the failure rate reaches the current HIGH threshold
+INCIDENT_FAILURE_RATE = SEVERITY_THRESHOLDS['HIGH']['failure_rate']
+INCIDENT_MIN_SAMPLE = MIN_SAMPLE_SIZE
+
+FLAP_GAP_WINDOWS = 2     # re-alerting within this many windows of clearing counts as a flap
+MAX_DELAY_WINDOWS = 10   # incidents not alerted within this many windows count as missed
+CONFIG_BATCH = 256       # configs evaluated per vectorized batch (bounds memory)
+
+class WindowSeries:
+    """Per-entity window aggregates as dense [entity, window] arrays"""
+    
+    def __init__(self, entities: List[str], window_starts: List[float], window_seconds: float,
+                 totals: np.ndarray, failures: np.ndarray, incidents: Optional[np.ndarray] = None):
+        self.entities = entities
+        self.window_starts = window_starts
+        self.window_seconds = window_seconds
+        self.totals = totals
+        self.failures = failures
+        self.incidents = incidents
+
+def _parse_ts(value) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+
+def series_from_windows(rows: List[Dict], window_seconds: Optional[float] = None) -> WindowSeries:
+    """
+    Build dense arrays from window rows:
+    {'window_start', 'entity_type', 'entity', 'total', 'failures'[, 'incident']}
+    """
+    entity_index = {}
+    window_index = {}
+    for row in rows:
+        entity_index.setdefault(f"{row.get('entity_type', 'bank')}:{row['entity']}", len(entity_index))
+        window_index.setdefault(_parse_ts(row['window_start']), None)
+    
+    starts = sorted(window_index)
+    if window_seconds is None:
+        window_seconds = float(np.min(np.diff(starts))) if len(starts) > 1 else 60.0
+    for i, start in enumerate(starts):
+        window_index[start] = i
+    
+    shape = (len(entity_index), len(starts))
+    totals = np.zeros(shape, dtype=np.int32)
+    failures = np.zeros(shape, dtype=np.int32)
+    labelled = any('incident' in row for row in rows)
+    incidents = np.zeros(shape, dtype=bool) if labelled else None
+    
+    for row in rows:
+        e = entity_index[f"{row.get('entity_type', 'bank')}:{row['entity']}"]
+        t = window_index[_parse_ts(row['window_start'])]
+        totals[e, t] += int(row['total'])
+        failures[e, t] += int(row['failures'])
+        if labelled and row.get('incident'):
+            incidents[e, t] = True
+    
+    entities = sorted(entity_index, key=entity_index.get)
+    return WindowSeries(entities, starts, window_seconds, totals, failures, incidents)
+
+def series_from_events(events: List[Dict], window_seconds: float = 60.0) -> WindowSeries:
+    """Bucket raw payment events into per-bank and per-method windows"""
+    windows = {}
+    for event in events:
+        if not event.get('timestamp'):
+            continue
+        start = int(_parse_ts(event['timestamp']) // window_seconds) * window_seconds
+        failed = 1 if event.get('status') == 'failure' else 0
+        for entity_type in ('bank', 'method'):
+            key = (start, entity_type, event.get(entity_type, 'unknown'))
+            counts = windows.setdefault(key, [0, 0])
+            counts[0] += 1
+            counts[1] += failed
+    
+    rows = [{'window_start': start, 'entity_type': entity_type, 'entity': entity,
+             'total': counts[0], 'failures': counts[1]}
+            for (start, entity_type, entity), counts in windows.items()]
+    return series_from_windows(rows, window_seconds)
+
+def build_grid(grid: Optional[Dict[str, List[float]]] = None) -> Dict[str, np.ndarray]:
+    """Cartesian product of parameter values as column arrays (one entry per config)"""
+    grid = {**DEFAULT_GRID, **(grid or {})}
+    names = list(grid)
+    combos = np.array(list(itertools.product(*(grid[name] for name in names))), dtype=np.float64)
+    configs = {name: combos[:, i] for i, name in enumerate(names)}
+    
+    # Keep only coherent severity tables (MEDIUM <= HIGH)
+    keep = configs['medium_failure_rate'] <= configs['high_failure_rate']
+    return {name: values[keep] for name, values in configs.items()}
+
+def classify_severity_grid(rate: np.ndarray, sample: np.ndarray, alert: np.ndarray,
+                           configs: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Vectorized reason.classify_severity.
+    
+    rate/sample are [entity, window]; config arrays are [config]. Returns an
+    int8 [config, entity, window] array: 0 = no alert, 1 = LOW, 2 = MEDIUM, 3 = HIGH.
+    The baseline is the config's failure-rate threshold, as in failure_rate_anomaly.
+    """
+    c = lambda name: configs[name][:, None, None]
+    baseline = c('failure_rate_threshold')
+    degradation = np.where(baseline > 0, rate / np.where(baseline > 0, baseline, 1), rate)
+    
+    high = (rate >= c('high_failure_rate')) | ((degradation >= 6.0) & (sample >= c('high_affected_min')))
+    medium = (rate >= c('medium_failure_rate')) | ((degradation >= 3.0) & (sample >= c('medium_affected_min')))
+    return (alert * (1 + (high | medium) + high)).astype(np.int8)
+
+def _first_within(state: np.ndarray, onset_e: np.ndarray, onset_t: np.ndarray):
+    """
+    Windows from each incident onset to the first window where state holds.
+    
+    Returns:
+        ([config, incident] delays, [config, incident] mask of delays within MAX_DELAY_WINDOWS)
+    """
+    n_windows = state.shape[-1]
+    state_at = np.where(state, np.arange(n_windows), n_windows)
+    next_state = np.minimum.accumulate(state_at[..., ::-1], axis=2)[..., ::-1]
+    delay = next_state[:, onset_e, onset_t] - onset_t
+    return delay, delay <= MAX_DELAY_WINDOWS
+
+def _mean_delay_seconds(delay: np.ndarray, detected: np.ndarray, window_seconds: float) -> np.ndarray:
+    n_detected = detected.sum(axis=1)
+    delay_sum = np.where(detected, delay, 0).sum(axis=1)
+    return np.divide(delay_sum * window_seconds, n_detected,
+                     out=np.full(len(n_detected), np.nan), where=n_detected > 0)
+
+def _rising_edges(state: np.ndarray) -> np.ndarray:
+    """True where state turns on (state[..., t] and not state[..., t-1])"""
+    previous = np.zeros_like(state)
+    previous[..., 1:] = state[..., :-1]
+    return state & ~previous
+
+def evaluate(series: WindowSeries, configs: Dict[str, np.ndarray], batch: int = CONFIG_BATCH) -> Dict[str, np.ndarray]:
+    """
+    Evaluate every config over the whole history.
+    
+    Returns per-config metric arrays: alerts (alert episodes), alert_windows,
+    high_windows, flaps, false_alerts, incidents, detected, missed and
+    mean_delay_seconds; and for severity: high_false_alerts (HIGH episodes
+    starting outside an incident), escalations (severity rising during an
+    alert), severity_changes (any severity change during an alert),
+    high_missed (incidents not reaching HIGH within MAX_DELAY_WINDOWS) and
+    mean_high_delay_seconds.
+    """
+    totals = series.totals.astype(np.float64)
+    rate = np.divide(series.failures * 100.0, totals, out=np.zeros_like(totals), where=totals > 0)
+    
+    if series.incidents is not None:
+        truth = series.incidents
+    else:
+        truth = (series.totals >= INCIDENT_MIN_SAMPLE) & (rate >= INCIDENT_FAILURE_RATE)
+    onsets = _rising_edges(truth)
+    onset_e, onset_t = np.nonzero(onsets)
+    
+    n_configs = len(next(iter(configs.values())))
+    metrics = {name: np.zeros(n_configs, dtype=np.float64) for name in (
+        'alerts', 'alert_windows', 'high_windows', 'flaps', 'false_alerts',
+        'incidents', 'detected', 'missed', 'mean_delay_seconds',
+        'high_false_alerts', 'escalations', 'severity_changes', 'high_missed', 'mean_high_delay_seconds')}
+    metrics['incidents'][:] = len(onset_e)
+    
+    for lo in range(0, n_configs, batch):
+        hi = min(lo + batch, n_configs)
+        part = {name: values[lo:hi] for name, values in configs.items()}
+        
+        # Same gate as reason.failure_rate_anomaly
+        alert = ((series.totals >= part['min_sample_size'][:, None, None])
+                 & (rate > part['failure_rate_threshold'][:, None, None]))
+        severity = classify_severity_grid(rate, series.totals, alert, part)
+        
+        rising = _rising_edges(alert)
+        metrics['alerts'][lo:hi] = rising.sum(axis=(1, 2))
+        metrics['alert_windows'][lo:hi] = alert.sum(axis=(1, 2))
+        metrics['high_windows'][lo:hi] = (severity == 3).sum(axis=(1, 2))
+        metrics['false_alerts'][lo:hi] = (rising & ~truth).sum(axis=(1, 2))
+        
+        # Flap: alert turns on again within FLAP_GAP_WINDOWS of having cleared
+        cumulative = np.cumsum(alert, axis=2, dtype=np.int32)
+        padded = np.concatenate([np.zeros(alert.shape[:2] + (FLAP_GAP_WINDOWS + 2,), dtype=np.int32),
+                                 cumulative], axis=2)
+        recent = padded[..., FLAP_GAP_WINDOWS:-2] - padded[..., :-(FLAP_GAP_WINDOWS + 2)]
+        metrics['flaps'][lo:hi] = (rising & (recent > 0)).sum(axis=(1, 2))
+        
+        # Severity behaviour: a rise above the live decision's severity is a new decision
+        high = severity == 3
+        previous = np.zeros_like(severity)
+        previous[..., 1:] = severity[..., :-1]
+        metrics['high_false_alerts'][lo:hi] = (_rising_edges(high) & ~truth).sum(axis=(1, 2))
+        metrics['escalations'][lo:hi] = ((severity > previous) & (previous > 0)).sum(axis=(1, 2))
+        metrics['severity_changes'][lo:hi] = ((severity != previous) & (severity > 0) & (previous > 0)).sum(axis=(1, 2))
+        
+        # Detection delay: first alert (and first HIGH) at or after each incident onset
+        if len(onset_e):
+            delay, detected = _first_within(alert, onset_e, onset_t)
+            metrics['detected'][lo:hi] = detected.sum(axis=1)
+            metrics['missed'][lo:hi] = len(onset_e) - detected.sum(axis=1)
+            metrics['mean_delay_seconds'][lo:hi] = _mean_delay_seconds(delay, detected, series.window_seconds)
+            
+            high_delay, high_detected = _first_within(high, onset_e, onset_t)
+            metrics['high_missed'][lo:hi] = len(onset_e) - high_detected.sum(axis=1)
+            metrics['mean_high_delay_seconds'][lo:hi] = _mean_delay_seconds(high_delay, high_detected, series.window_seconds)
+    
+    return metrics
+
+def rank(configs: Dict[str, np.ndarray], metrics: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Config order: fewest missed incidents, then incidents never reaching HIGH,
+    false alerts, false HIGH alerts, flaps, escalations, delay to HIGH and
+    detection delay
+    """
+    delay = np.nan_to_num(metrics['mean_delay_seconds'], nan=np.inf)
+    high_delay = np.nan_to_num(metrics['mean_high_delay_seconds'], nan=np.inf)
+    return np.lexsort((delay, high_delay, metrics['escalations'], metrics['flaps'],
+                       metrics['high_false_alerts'], metrics['false_alerts'],
+                       metrics['high_missed'], metrics['missed']))
+
+def current_config_index(configs: Dict[str, np.ndarray]) -> Optional[int]:
+    """Index of the configuration currently in reason.py, if it is in the grid"""
+    current = {
+        'failure_rate_threshold': FAILURE_RATE_THRESHOLD,
+        'min_sample_size': MIN_SAMPLE_SIZE,
+        'medium_failure_rate': SEVERITY_THRESHOLDS['MEDIUM']['failure_rate'],
+        'high_failure_rate': SEVERITY_THRESHOLDS['HIGH']['failure_rate'],
+        'medium_affected_min': SEVERITY_THRESHOLDS['MEDIUM']['affected_min'],
+        'high_affected_min': SEVERITY_THRESHOLDS['HIGH']['affected_min']
+    }
+    match = np.ones(len(configs['failure_rate_threshold']), dtype=bool)
+    for name, value in current.items():
+        match &= configs[name] == value
+    hits = np.nonzero(match)[0]
+    return int(hits[0]) if len(hits) else None
+
+def _row(configs, metrics, i) -> Dict:
+    row = {name: float(values[i]) for name, values in configs.items()}
+    row.update({name: float(values[i]) for name, values in metrics.items()})
+    return row
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep detection thresholds over historical windows")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--windows', help="JSON lines of per-entity window aggregates")
+    source.add_argument('--events', help="JSON list of payment events (or a /events response)")
+    parser.add_argument('--window-seconds', type=float, default=60.0, help="Window width when bucketing events")
+    parser.add_argument('--top', type=int, default=10, help="Number of configurations to print")
+    parser.add_argument('--out', help="Write every configuration's metrics to this CSV file")
+    args = parser.parse_args()
+    
+    if args.windows:
+        with open(args.windows) as f:
+            series = series_from_windows([json.loads(line) for line in f if line.strip()])
+    else:
+        with open(args.events) as f:
+            data = json.load(f)
+        series = series_from_events(data.get('events', []) if isinstance(data, dict) else data, args.window_seconds)
+    
+    configs = build_grid()
+    n_configs = len(configs['failure_rate_threshold'])
+    print(f"📈 {len(series.entities)} entities x {len(series.window_starts)} windows, {n_configs} configurations")
+    
+    started = time.perf_counter()
+    metrics = evaluate(series, configs)
+    elapsed = time.perf_counter() - started
+    print(f"   Evaluated in {elapsed:.2f}s ({n_configs / max(elapsed, 1e-9):,.0f} configs/s)\n")
+    
+    order = rank(configs, metrics)
+    columns = ('failure_rate_threshold', 'min_sample_size', 'medium_failure_rate', 'high_failure_rate',
+               'medium_affected_min', 'high_affected_min', 'alerts', 'false_alerts', 'flaps',
+               'missed', 'mean_delay_seconds', 'high_false_alerts', 'escalations', 'high_missed',
+               'mean_high_delay_seconds')
+    print("  ".join(f"{name[:12]:>12}" for name in columns))
+    current = current_config_index(configs)
+    for i in list(order[:args.top]) + ([current] if current is not None and current not in order[:args.top] else []):
+        row = _row(configs, metrics, i)
+        marker = "  <- current" if i == current else ""
+        print("  ".join(f"{row[name]:>12.1f}" for name in columns) + marker)
+    
+    if args.out:
+        with open(args.out, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(configs) + list(metrics))
+            writer.writeheader()
+            for i in order:
+                writer.writerow(_row(configs, metrics, i))
+        print(f"\n✓ Wrote {n_configs} configurations to {args.out}")
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,7 @@
 import express from 'express';
 import cors from 'cors';
 import { WebSocketServer } from 'ws';
-import { createServer } from 'http';
+import { createServer, get as httpGet } from 'http';
 
 const app = express();
 const server = createServer(app);
@@ -477,7 +477,7 @@ const AGENT_URL = 'http://localhost:3002';
 
 app.get('/agent/insights', async (req, res) => {
   try {
-    const response = await fetch(`${AGENT_URL}/agent/insights`);
+    const response = await fetch(`${AGENT_URL}${req.originalUrl}`);
     const data = await response.json();
     res.json(data);
   } catch (error) {
@@ -507,7 +507,7 @@ app.get('/agent/status', async (req, res) => {
 
 app.get('/agent/decisions', async (req, res) => {
   try {
-    const response = await fetch(`${AGENT_URL}/agent/decisions`);
+    const response = await fetch(`${AGENT_URL}${req.originalUrl}`);
     const data = await response.json();
     res.json(data);
   } catch (error) {
@@ -522,7 +522,7 @@ app.get('/agent/decisions', async (req, res) => {
 
 app.get('/agent/workflow_state', async (req, res) => {
   try {
-    const response = await fetch(`${AGENT_URL}/agent/workflow_state`);
+    const response = await fetch(`${AGENT_URL}${req.originalUrl}`);
     const data = await response.json();
     res.json(data);
   } catch (error) {
@@ -535,6 +535,34 @@ app.get('/agent/workflow_state', async (req, res) => {
   }
 });
 
+// GET /agent/stream - Server-sent events pass-through
+app.get('/agent/stream', (req, res) => {
+  const headers = {};
+  if (req.get('Last-Event-ID')) {
+    headers['Last-Event-ID'] = req.get('Last-Event-ID');
+  }
+
+  const upstream = httpGet(`${AGENT_URL}${req.originalUrl}`, { headers }, (agentRes) => {
+    res.writeHead(agentRes.statusCode, {
+      'Content-Type': 'text/event-stream',
+      'Cache-Control': 'no-cache',
+      'Connection': 'keep-alive'
+    });
+    agentRes.pipe(res);
+  });
+
+  upstream.on('error', (error) => {
+    console.error('Error streaming agent changes:', error.message);
+    if (!res.headersSent) {
+      res.status(502).json({ success: false, error: 'Agent service unavailable' });
+    } else {
+      res.end();
+    }
+  });
+
+  req.on('close', () => upstream.destroy());
+});
+
 // ============================================================================
 // WEBSOCKET HANDLING
 // ============================================================================
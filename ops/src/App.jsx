@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import './App.css'
 import './workflow-styles.css'
 
@@ -26,6 +26,10 @@ function App() {
   const [workflowState, setWorkflowState] = useState(null)
   const [workflowAnimationStep, setWorkflowAnimationStep] = useState(0)
   
+  // Last agent state versions seen, so polls only fetch what changed
+  const insightsVersion = useRef(null)
+  const workflowVersion = useRef(null)
+  
   // Historical data for mini-charts (last 20 data points)
   const [historyData, setHistoryData] = useState({
     totalPayments: [],
@@ -117,12 +121,26 @@ function App() {
     try {
       setAgentLoading(true)
       
-      // Fetch insights
-      const insightsResponse = await fetch(`${BACKEND_URL}/agent/insights`)
+      // Fetch insights (delta since last seen version once we have one)
+      const insightsSince = insightsVersion.current !== null ? `?since=${insightsVersion.current}` : ''
+      const insightsResponse = await fetch(`${BACKEND_URL}/agent/insights${insightsSince}`)
       if (insightsResponse.ok) {
         const insightsData = await insightsResponse.json()
         if (insightsData.success) {
-          setAgentInsights(insightsData.insights || [])
+          if (insightsData.full !== false) {
+            setAgentInsights(insightsData.insights || [])
+          } else if (insightsData.insights.length > 0 || insightsData.removed.length > 0) {
+            setAgentInsights(prev => {
+              const updates = new Map(insightsData.insights.map(i => [i.decision_id, i]))
+              const removed = new Set(insightsData.removed)
+              const merged = prev
+                .filter(i => !removed.has(i.decision_id))
+                .map(i => updates.get(i.decision_id) || i)
+              const known = new Set(merged.map(i => i.decision_id))
+              return [...merged, ...insightsData.insights.filter(i => !known.has(i.decision_id))]
+            })
+          }
+          insightsVersion.current = insightsData.version ?? null
         }
       }
       
@@ -137,11 +155,15 @@ function App() {
       
       // Fetch workflow state if viewer is open
       if (workflowViewerOpen) {
-        const workflowResponse = await fetch(`${BACKEND_URL}/agent/workflow_state`)
+        const workflowSince = workflowVersion.current !== null ? `?since=${workflowVersion.current}` : ''
+        const workflowResponse = await fetch(`${BACKEND_URL}/agent/workflow_state${workflowSince}`)
         if (workflowResponse.ok) {
           const workflowData = await workflowResponse.json()
           if (workflowData.success) {
-            setWorkflowState(workflowData.workflow)
+            setWorkflowState(prev => (workflowData.full !== false || !prev)
+              ? workflowData.workflow
+              : { ...prev, ...workflowData.workflow })
+            workflowVersion.current = workflowData.version ?? null
           }
         }
       }